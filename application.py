@@ -2,57 +2,191 @@
 
 import asyncio
 import os
+import time
 import websockets
 import json
 
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from bot import Bot
-from bot_message import BotMessage, MessageType
-from game_message import Tick, Team
+from bot_message import BotMessage, MessageType, encode_bot_message
+from game_message import Tick, Team, decode_tick
+from profiler import Profiler
+from recorder import TickRecorder
+from log import get_logger
 
+logger = get_logger("application")
 
-async def run():
-    uri = "ws://127.0.0.1:8765"
 
+DEFAULT_URI = "ws://127.0.0.1:8765"
+
+
+async def run(
+    uri: str = DEFAULT_URI,
+    team_name: Optional[str] = None,
+    token: Optional[str] = None,
+    recorder: Optional[TickRecorder] = None,
+    profiler: Optional[Profiler] = None,
+):
+    """Play one game. Without a token we register with the team name."""
     async with websockets.connect(uri) as websocket:
-        bot = Bot()
-        if "TOKEN" in os.environ:
-            await websocket.send(
-                json.dumps({"type": "REGISTER", "token": os.environ["TOKEN"]})
-            )
+        bot = Bot(profiler=profiler)
+        if token is not None:
+            await websocket.send(json.dumps({"type": "REGISTER", "token": token}))
         else:
-            team_name = os.environ.get("TEAMNAME") or "UwUBot"
             await websocket.send(
-                json.dumps({"type": "REGISTER", "teamName": team_name})
+                json.dumps({"type": "REGISTER", "teamName": team_name or "UwUBot"})
             )
 
-        await game_loop(websocket=websocket, bot=bot)
+        await game_loop(websocket=websocket, bot=bot, recorder=recorder)
 
 
-async def game_loop(websocket: websockets.WebSocketServerProtocol, bot: Bot):
-    while True:
-        try:
+def main():
+    # Set RECORD_TICKS=game.jsonl.gz to replay the game with replay.py
+    recorder = None
+    if "RECORD_TICKS" in os.environ:
+        recorder = TickRecorder(os.environ["RECORD_TICKS"])
+
+    asyncio.get_event_loop().run_until_complete(
+        run(
+            team_name=os.environ.get("TEAMNAME"),
+            token=os.environ.get("TOKEN"),
+            recorder=recorder,
+        )
+    )
+
+
+class LatestFrame:
+    """
+    Holds the newest frame received and not planned yet. A frame replaced by
+    a newer one before the planner got to it is counted as dropped.
+    """
+
+    def __init__(self) -> None:
+        self.frame: Optional[Tuple[str, float]] = None
+        self.dropped = 0
+        self.closed = False
+        self.event = asyncio.Event()
+
+    def put(self, message: str, received_at: float) -> None:
+        if self.frame is not None:
+            self.dropped += 1
+        self.frame = (message, received_at)
+        self.event.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self.event.set()
+
+    async def get(self) -> Optional[Tuple[str, float]]:
+        """Wait for the next frame, None once the websocket is closed"""
+        while self.frame is None:
+            if self.closed:
+                return None
+            self.event.clear()
+            await self.event.wait()
+        frame, self.frame = self.frame, None
+        return frame
+
+
+async def read_frames(
+    websocket: websockets.WebSocketServerProtocol,
+    frames: LatestFrame,
+    recorder: Optional[TickRecorder] = None,
+    record_executor: Optional[ThreadPoolExecutor] = None,
+) -> None:
+    try:
+        while True:
             message = await websocket.recv()
-        except websockets.exceptions.ConnectionClosed:
-            # Connection is closed, the game is probably over
-            print("Websocket was closed.")
-            break
+            received_at = time.perf_counter()
+            if recorder is not None:
+                # gzip writes block, keep them off the event loop. A single
+                # worker writes the frames in the order they came.
+                record_executor.submit(recorder.record, message)
+            frames.put(message, received_at)
+    except websockets.exceptions.ConnectionClosed:
+        # Connection is closed, the game is probably over
+        logger.info("Websocket was closed.")
+    finally:
+        frames.close()
 
-        game_message: Tick = Tick.from_dict(json.loads(message))
-        print(f"Playing tick {game_message.tick} of {game_message.totalTick}")
 
+def plan(bot: Bot, message: str) -> Optional[Tuple[int, str]]:
+    """
+    Decode a frame and compute the answer, runs in the worker thread. None if
+    the frame can't be decoded, the next one may be fine.
+    """
+    try:
+        game_message: Tick = decode_tick(message)
         my_team: Team = game_message.get_teams_by_id()[game_message.teamId]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        logger.exception("Skipping a frame that could not be decoded")
+        return None
+    logger.info("Playing tick %s of %s", game_message.tick, game_message.totalTick)
 
-        if my_team.errors:
-            print(f"Bot command errors :  {' '.join(my_team.errors)}")
+    if my_team.errors:
+        logger.warning("Bot command errors :  %s", " ".join(my_team.errors))
 
-        next_moves: List = bot.get_next_moves(game_message)
-        await websocket.send(
-            BotMessage(
-                type=MessageType.COMMAND, actions=next_moves, tick=game_message.tick
-            ).to_json()
-        )
+    next_moves: List = bot.get_next_moves(game_message)
+    return game_message.tick, encode_bot_message(
+        BotMessage(type=MessageType.COMMAND, actions=next_moves, tick=game_message.tick)
+    )
+
+
+async def game_loop(
+    websocket: websockets.WebSocketServerProtocol,
+    bot: Bot,
+    recorder: Optional[TickRecorder] = None,
+):
+    """
+    Frames keep being read while a tick is planned in a worker thread, so a
+    slow tick doesn't block the websocket. We always plan the newest tick,
+    older ones that arrived meanwhile are dropped.
+    """
+    loop = asyncio.get_event_loop()
+    frames = LatestFrame()
+    record_executor = ThreadPoolExecutor(max_workers=1) if recorder else None
+    reader = asyncio.ensure_future(
+        read_frames(websocket, frames, recorder, record_executor)
+    )
+
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while True:
+                frame = await frames.get()
+                if frame is None:
+                    break
+                message, received_at = frame
+
+                planned = await loop.run_in_executor(executor, plan, bot, message)
+                if planned is None:
+                    continue
+                tick, response = planned
+                try:
+                    await websocket.send(response)
+                except websockets.exceptions.ConnectionClosed:
+                    break
+                logger.info(
+                    "Tick %s answered %.1f ms after reception, %s stale ticks dropped",
+                    tick,
+                    (time.perf_counter() - received_at) * 1000,
+                    frames.dropped,
+                )
+    finally:
+        # Also when planning failed, the recording of that game is the one to
+        # replay
+        if not reader.done():
+            reader.cancel()
+        try:
+            await reader
+        except asyncio.CancelledError:
+            pass
+        bot.end_game()
+        if recorder is not None:
+            # Let the pending frames be written first
+            await loop.run_in_executor(None, record_executor.shutdown)
+            recorder.close()
 
 
 if __name__ == "__main__":
-    asyncio.get_event_loop().run_until_complete(run())
+    main()
@@ -0,0 +1,215 @@
+"""
+Memory allocated and time per dijkstra/astar query and per DistanceField,
+the code as it was before SearchBuffers (copied below: lists allocated for
+every call, the path turned into Positions with Position(*divmod), a deque
+for the BFS) against the current one. Also the size of a Position with and
+without __slots__.
+
+python -m benchmarks.alloc
+"""
+
+import heapq
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Collection, List, Sequence, Tuple
+
+from benchmarks.sample import make_tick_dict
+from distance_field import DistanceField
+from game_message import Position, tick_from_dict
+from grid import Grid
+from search import _backtrace, astar, dijkstra, manhattan
+from simulator import generate_tiles
+
+
+@dataclass(frozen=True)
+class DictPosition:
+    """Position as it was, with a __dict__"""
+
+    x: int
+    y: int
+
+
+def old_dijkstra(
+    grid: Grid, start: int, goals: Collection[int], no_spawn: bool = False
+) -> Tuple[List[int], int]:
+    """search.dijkstra before SearchBuffers"""
+    walkable = grid.walkable_no_spawn if no_spawn else grid.walkable
+
+    dist = [-1] * len(walkable)
+    prev = [-1] * len(walkable)
+    closed = bytearray(len(walkable))
+    dist[start] = 0
+    queue = [(0, start)]
+    expanded = 0
+
+    while queue:
+        _, u = heapq.heappop(queue)
+        if closed[u]:
+            continue
+        closed[u] = 1
+        expanded += 1
+        if u in goals:
+            return _backtrace(prev, u), expanded
+
+        new_dist = dist[u] + 1
+        for v in grid.neighbors(u):
+            if not walkable[v]:
+                continue
+            if dist[v] == -1 or new_dist < dist[v]:
+                dist[v] = new_dist
+                prev[v] = u
+                heapq.heappush(queue, (new_dist, v))
+
+    return [], expanded
+
+
+def old_astar(
+    grid: Grid, start: int, goal: int, no_spawn: bool = False
+) -> Tuple[List[int], int]:
+    """search.astar before SearchBuffers"""
+    walkable = grid.walkable_no_spawn if no_spawn else grid.walkable
+    height = grid.height
+    gx, gy = divmod(goal, height)
+
+    dist = [-1] * len(walkable)
+    prev = [-1] * len(walkable)
+    closed = bytearray(len(walkable))
+    dist[start] = 0
+    queue = [(manhattan(height, start, goal), 0, start)]
+    expanded = 0
+
+    while queue:
+        _, negative_dist, u = heapq.heappop(queue)
+        if closed[u]:
+            continue
+        closed[u] = 1
+        expanded += 1
+        if u == goal:
+            return _backtrace(prev, u), expanded
+
+        new_dist = -negative_dist + 1
+        for v in grid.neighbors(u):
+            if not walkable[v] or closed[v]:
+                continue
+            if dist[v] == -1 or new_dist < dist[v]:
+                dist[v] = new_dist
+                prev[v] = u
+                vx, vy = divmod(v, height)
+                estimate = new_dist + abs(vx - gx) + abs(vy - gy)
+                heapq.heappush(queue, (estimate, -new_dist, v))
+
+    return [], expanded
+
+
+def old_distance_field(
+    grid: Grid, sources: Sequence[int], no_spawn: bool = False
+) -> Tuple[List[int], List[int], List[int]]:
+    """The BFS of DistanceField.__init__ before SearchBuffers"""
+    size = grid.width * grid.height
+    walkable = grid.walkable_no_spawn if no_spawn else grid.walkable
+    dist = [-1] * size
+    label = [-1] * size
+    prev = [-1] * size
+
+    queue = deque()
+    for n, source in enumerate(sources):
+        if dist[source] == -1:
+            dist[source] = 0
+            label[source] = n
+            queue.append(source)
+
+    while queue:
+        u = queue.popleft()
+        new_dist = dist[u] + 1
+        u_label = label[u]
+        for v in grid.neighbors(u):
+            if walkable[v] and dist[v] == -1:
+                dist[v] = new_dist
+                label[v] = u_label
+                prev[v] = u
+                queue.append(v)
+
+    return dist, label, prev
+
+
+def measure(query: Callable[..., object], args_list) -> Tuple[float, float]:
+    """(KiB allocated at peak, ms) per query"""
+    peak = 0
+    for args in args_list:
+        tracemalloc.start()
+        query(*args)
+        peak += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    started = time.perf_counter()
+    for args in args_list:
+        query(*args)
+    elapsed = time.perf_counter() - started
+    return peak / len(args_list) / 1024, elapsed / len(args_list) * 1000
+
+
+def main() -> None:
+    slotted = sys.getsizeof(Position(1, 2))
+    old_position = DictPosition(1, 2)
+    with_dict = sys.getsizeof(old_position) + sys.getsizeof(old_position.__dict__)
+    print(f"Position: {slotted} bytes with __slots__, {with_dict} with a __dict__")
+
+    rng = random.Random(0)
+    for size in (20, 40, 60):
+        data = make_tick_dict(width=size, height=size)
+        data["map"]["tiles"] = generate_tiles(size, size, rng)
+        tick = tick_from_dict(data)
+        grid = tick.map.get_grid()
+        height = grid.height
+        positions = tick.map.get_positions()
+        cells = [i for i, walkable in enumerate(grid.walkable) if walkable]
+        pairs = [(rng.choice(cells), rng.choice(cells)) for _ in range(200)]
+        source_sets = [(tuple(rng.sample(cells, 8)),) for _ in range(50)]
+
+        def old_nearest(start: int, goal: int) -> List[Position]:
+            path, _ = old_dijkstra(grid, start, frozenset((goal,)))
+            return [Position(*divmod(i, height)) for i in path]
+
+        def new_nearest(start: int, goal: int) -> List[Position]:
+            path, _ = dijkstra(grid, start, frozenset((goal,)))
+            return [positions[i] for i in path]
+
+        def old_path(start: int, goal: int) -> List[Position]:
+            path, _ = old_astar(grid, start, goal)
+            return [Position(*divmod(i, height)) for i in path]
+
+        def new_path(start: int, goal: int) -> List[Position]:
+            path, _ = astar(grid, start, goal)
+            return [positions[i] for i in path]
+
+        def old_field(sources: Sequence[int]) -> None:
+            old_distance_field(grid, sources)
+
+        def new_field(sources: Sequence[int]) -> None:
+            # The bot gives the fields of the previous tick back
+            DistanceField(grid, sources).release()
+
+        # The shared buffers are built on the first search, not per query
+        astar(grid, pairs[0][0], pairs[0][1])
+        new_field(source_sets[0][0])
+
+        print(f"{size}x{size} simulator map")
+        for name, old, new, args_list in (
+            ("dijkstra", old_nearest, new_nearest, pairs),
+            ("astar", old_path, new_path, pairs),
+            ("distance field", old_field, new_field, source_sets),
+        ):
+            old_kib, old_ms = measure(old, args_list)
+            new_kib, new_ms = measure(new, args_list)
+            print(
+                f"  {name} ({len(args_list)} queries): {old_kib:.1f} KiB "
+                f"{old_ms:.3f} ms before, {new_kib:.1f} KiB {new_ms:.3f} ms after"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Compare the dataclasses_json decoding of a tick to game_message.decode_tick.
+
+python -m benchmarks.decode
+"""
+
+import json
+import timeit
+
+from benchmarks.sample import make_tick_message
+from game_message import Tick, decode_tick
+
+
+def main() -> None:
+    for size, nb_units in ((20, 4), (40, 4), (60, 10)):
+        message = make_tick_message(width=size, height=size, nb_units=nb_units)
+        assert decode_tick(message) == Tick.from_dict(json.loads(message))
+
+        number = 50
+        old = timeit.timeit(lambda: Tick.from_dict(json.loads(message)), number=number)
+        new = timeit.timeit(lambda: decode_tick(message), number=number)
+        print(
+            f"{size}x{size} map, {nb_units} units/team: "
+            f"from_dict {old / number * 1000:.2f} ms, "
+            f"decode_tick {new / number * 1000:.2f} ms "
+            f"({old / new:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Compare BotMessage.to_json() to bot_message.encode_bot_message.
+
+python -m benchmarks.encode
+"""
+
+import timeit
+
+from bot_message import BotMessage, MessageType, encode_bot_message
+from game_command import CommandAction, CommandType
+from game_message import Position
+
+
+def make_message(nb_units: int) -> BotMessage:
+    types = list(CommandType)
+    actions = []
+    for i in range(nb_units):
+        action_type = types[i % len(types)]
+        target = None if action_type == CommandType.SUMMON else Position(i % 7, i % 11)
+        actions.append(
+            CommandAction(action=action_type, unitId=f"unit-{i}", target=target)
+        )
+    return BotMessage(type=MessageType.COMMAND, actions=actions, tick=42)
+
+
+def main() -> None:
+    for nb_units in (1, 10, 100):
+        message = make_message(nb_units)
+        assert encode_bot_message(message) == message.to_json()
+
+        number = 2000 // nb_units + 100
+        old = timeit.timeit(message.to_json, number=number)
+        new = timeit.timeit(lambda: encode_bot_message(message), number=number)
+        print(
+            f"{nb_units} units: "
+            f"to_json {old / number * 1e6:.1f} us, "
+            f"encode_bot_message {new / number * 1e6:.1f} us "
+            f"({old / new:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import json
+import random
+from typing import Any, Dict
+
+
+def make_tick_dict(
+    width: int = 40,
+    height: int = 40,
+    nb_teams: int = 4,
+    nb_units: int = 4,
+    nb_diamonds: int = 10,
+    tick: int = 10,
+    total_tick: int = 100,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Random tick shaped like the ones sent by the server"""
+    rng = random.Random(seed)
+    tiles = [["EMPTY"] * height for _ in range(width)]
+    for x in range(width):
+        for y in range(height):
+            r = rng.random()
+            if r < 0.15:
+                tiles[x][y] = "WALL"
+            elif r < 0.2:
+                tiles[x][y] = "SPAWN"
+
+    free = [
+        (x, y) for x in range(width) for y in range(height) if tiles[x][y] == "EMPTY"
+    ]
+    rng.shuffle(free)
+
+    team_ids = [f"team-{i}" for i in range(nb_teams)]
+    teams = []
+    diamonds = []
+    for t, team_id in enumerate(team_ids):
+        units = []
+        for u in range(nb_units):
+            unit_id = f"unit-{t}-{u}"
+            x, y = free.pop()
+            diamond_id = None
+            if rng.random() < 0.2:
+                diamond_id = f"diamond-{len(diamonds)}"
+                diamonds.append(
+                    {
+                        "id": diamond_id,
+                        "position": {"x": x, "y": y},
+                        "summonLevel": rng.randint(1, 5),
+                        "points": 10,
+                        "ownerId": unit_id,
+                    }
+                )
+            units.append(
+                {
+                    "id": unit_id,
+                    "teamId": team_id,
+                    "position": {"x": x, "y": y},
+                    "path": [{"x": x, "y": y}],
+                    "hasDiamond": diamond_id is not None,
+                    "diamondId": diamond_id,
+                    "hasSpawned": True,
+                    "isSummoning": False,
+                    "lastState": {"positionBefore": {"x": x, "y": y}},
+                }
+            )
+        teams.append(
+            {"id": team_id, "name": team_id, "score": 0, "units": units, "errors": []}
+        )
+
+    for _ in range(nb_diamonds):
+        x, y = free.pop()
+        diamonds.append(
+            {
+                "id": f"diamond-{len(diamonds)}",
+                "position": {"x": x, "y": y},
+                "summonLevel": 1,
+                "points": 10,
+            }
+        )
+
+    orderings = {}
+    for t in range(tick, min(total_tick, tick + nb_teams**2)):
+        order = team_ids[:]
+        rng.shuffle(order)
+        orderings[str(t)] = order
+
+    return {
+        "type": "TICK",
+        "tick": tick,
+        "totalTick": total_tick,
+        "teamId": team_ids[0],
+        "teams": teams,
+        "map": {"tiles": tiles, "diamonds": diamonds},
+        "gameConfig": {
+            "pointsPerDiamond": 10,
+            "maximumDiamondSummonLevel": 5,
+            "initialDiamondSummonLevel": 1,
+        },
+        "teamPlayOrderings": orderings,
+    }
+
+
+def make_tick_message(**kwargs: Any) -> str:
+    return json.dumps(make_tick_dict(**kwargs))
@@ -0,0 +1,92 @@
+"""
+Nodes expanded and time of dijkstra (nearest of goals, with a single goal)
+against the A* and bidirectional searches of search.py, on random start/goal
+pairs. The searches are called directly, without the QueryCache of the Bot.
+
+python -m benchmarks.search
+"""
+
+import random
+import time
+from typing import Callable, List, Tuple
+
+from benchmarks.sample import make_tick_dict
+from game_message import tick_from_dict
+from grid import Grid
+from search import astar, bidirectional_search, dijkstra, manhattan
+from simulator import generate_tiles
+
+# Manhattan distance from which a query counts as a long one
+LONG_PATH = 20
+
+
+def make_pairs(grid: Grid, count: int, rng: random.Random) -> List[Tuple[int, int]]:
+    cells = [i for i, walkable in enumerate(grid.walkable) if walkable]
+    return [(rng.choice(cells), rng.choice(cells)) for _ in range(count)]
+
+
+def run(
+    name: str, search: Callable[[int, int], Tuple[int, int]], pairs, expected=None
+) -> List[int]:
+    lengths = []
+    nodes = 0
+    started = time.perf_counter()
+    for start, goal in pairs:
+        length, expanded = search(start, goal)
+        lengths.append(length)
+        nodes += expanded
+    elapsed = time.perf_counter() - started
+    if expected is not None:
+        assert lengths == expected, f"{name} paths differ from dijkstra"
+    print(
+        f"  {name}: {nodes / len(pairs):.0f} nodes, "
+        f"{elapsed / len(pairs) * 1000:.3f} ms per query"
+    )
+    return lengths
+
+
+def main() -> None:
+    rng = random.Random(0)
+    maps = [
+        (f"{size}x{size} sample map", make_tick_dict(width=size, height=size))
+        for size in (20, 40, 60)
+    ]
+    for size in (30, 60):
+        # Rooms and corridors, closer to the real maps
+        data = make_tick_dict(width=size, height=size)
+        data["map"]["tiles"] = generate_tiles(size, size, rng)
+        maps.append((f"{size}x{size} simulator map", data))
+
+    for name, data in maps:
+        tick = tick_from_dict(data)
+        grid = tick.map.get_grid()
+        pairs = make_pairs(grid, 400, rng)
+        long_pairs = [
+            (start, goal)
+            for start, goal in pairs
+            if manhattan(grid.height, start, goal) >= LONG_PATH
+        ]
+        short_pairs = [pair for pair in pairs if pair not in long_pairs]
+
+        def with_length(search: Callable) -> Callable[[int, int], Tuple[int, int]]:
+            def query(start: int, goal: int) -> Tuple[int, int]:
+                path, expanded = search(grid, start, goal)
+                return (len(path) if path else -1), expanded
+
+            return query
+
+        for label, selected in (("short", short_pairs), ("long", long_pairs)):
+            if not selected:
+                continue
+            print(f"{name}, {len(selected)} {label} queries")
+            expected = run(
+                "dijkstra",
+                with_length(lambda grid, start, goal: dijkstra(grid, start, {goal})),
+                selected,
+            )
+            run("astar", with_length(astar), selected, expected)
+            run("bidirectional", with_length(bidirectional_search), selected, expected)
+
+
+if __name__ == "__main__":
+    main()
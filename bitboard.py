@@ -0,0 +1,121 @@
+"""
+Bitboards: sets of cells stored as Python ints, bit i set for the cell
+index i = x * height + y. Unions, intersections and neighbour expansions
+then work on the whole map at once instead of one Position at a time.
+
+Moving along y is a shift by 1, which would wrap from the last row of a
+column into the first row of the next one, so those cells are masked out
+first. Moving along x is a shift by height, cells shifted off the map are
+dropped by the full mask (or by the right shift itself).
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterator, List
+
+from map_cache import EMPTY, SPAWN, WALL, StaticMap
+
+if TYPE_CHECKING:
+    from game_message import Tick
+
+_TO_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def from_mask(mask: bytearray) -> int:
+    """Bitboard of the cells set to 1 in a bytearray like StaticMap.walkable"""
+    if not mask:
+        return 0
+    return int(bytes(mask).translate(_TO_DIGITS)[::-1], 2)
+
+
+def from_cells(cells: List[int]) -> int:
+    board = 0
+    for i in cells:
+        board |= 1 << i
+    return board
+
+
+def iter_cells(board: int) -> Iterator[int]:
+    """Cell indices of the set bits, lowest first"""
+    while board:
+        low = board & -board
+        yield low.bit_length() - 1
+        board ^= low
+
+
+class MapBitboards:
+    """Bitboards of the tiles, built once per game (see get_map_bitboards)"""
+
+    def __init__(self, static_map: StaticMap) -> None:
+        self.width = static_map.width
+        self.height = static_map.height
+        self.size = static_map.size
+        self.full = (1 << self.size) - 1
+
+        tiles = static_map.tiles
+        self.walls = from_mask(bytearray(tile == WALL for tile in tiles))
+        self.spawns = from_mask(bytearray(tile == SPAWN for tile in tiles))
+        self.empty = from_mask(bytearray(tile == EMPTY for tile in tiles))
+        self.walkable = self.full & ~self.walls
+
+        # Cells that may move up (y + 1) or down (y - 1) without wrapping
+        last_row = from_cells(
+            [x * self.height + self.height - 1 for x in range(self.width)]
+        )
+        first_row = from_cells([x * self.height for x in range(self.width)])
+        self.can_go_up = self.full & ~last_row
+        self.can_go_down = self.full & ~first_row
+
+    def neighbors(self, board: int) -> int:
+        """Cells next to a cell of board (board itself not included)"""
+        height = self.height
+        return (
+            ((board & self.can_go_up) << 1)
+            | ((board & self.can_go_down) >> 1)
+            | ((board << height) & self.full)
+            | (board >> height)
+        ) & ~board
+
+    def reachable(self, sources: int, walkable: int, moves: int) -> int:
+        """Cells at most moves away from sources, through walkable cells"""
+        board = sources
+        for _ in range(moves):
+            expanded = board | (self.neighbors(board) & walkable)
+            if expanded == board:
+                break
+            board = expanded
+        return board
+
+    def bit(self, x: int, y: int) -> int:
+        return 1 << (x * self.height + y)
+
+    def in_bound(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+
+def get_map_bitboards(static_map: StaticMap) -> MapBitboards:
+    """MapBitboards kept on the StaticMap, so shared by the whole game"""
+    try:
+        return static_map._bitboards
+    except AttributeError:
+        static_map._bitboards = MapBitboards(static_map)
+        return static_map._bitboards
+
+
+class TickBitboards:
+    """Units of one tick, on top of the MapBitboards"""
+
+    def __init__(self, tick: Tick) -> None:
+        self.map = get_map_bitboards(tick.map.get_static_map())
+        height = self.map.height
+
+        self.units = 0
+        self.enemies = 0
+        for team in tick.teams:
+            board = 0
+            for unit in team.units:
+                if unit.position is not None:
+                    board |= 1 << (unit.position.x * height + unit.position.y)
+            self.units |= board
+            if team.id != tick.teamId:
+                self.enemies |= board
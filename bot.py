@@ -1,95 +1,427 @@
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from game_message import Tick, Position, TickMap, TileType, Diamond, Unit
 from game_command import CommandAction, CommandType
-
+from grid import Grid
+from map_cache import UNREACHABLE, WALL
+from distance_field import DistanceField
+from tick_diff import TickDiff
+from planner import ReservationTable, assign_targets
+from search import astar
+from query_cache import (
+    DISTANCE_FIELD,
+    FIELD_PATH,
+    LASSO_TARGETS,
+    NEAREST_ENEMY,
+    PATH,
+    Query,
+)
+from carrier_search import DROP, SEARCH_RADIUS, STAY, SUMMON, CarrierSearch
+from bitboard import iter_cells
+from profiler import Profiler
+
+import logging
 import random
-import heapq
-import traceback
+import time
+
+from log import get_logger
 
-DEBUG = True
+logger = get_logger("bot")
 
+# Seconds we give ourselves to answer a tick, and to decide for a single unit.
+# Past the deadline the remaining units keep their fallback move.
+TICK_BUDGET = 0.5
+UNIT_BUDGET = 0.15
+# Part of the tick budget kept for plan_moves, the per-unit loop stops earlier
+PLAN_MOVES_SHARE = 0.2
+# Longest a carrier lookahead may run, it stops at the unit deadline anyway
+CARRIER_SEARCH_BUDGET = 0.05
 
-def log(*args, **kwargs) -> None:
-    if DEBUG:
-        print(*args, **kwargs)
+# Bot methods timed when profiling is enabled (BOT_PROFILE=<file>)
+PROFILED_STAGES = (
+    "can_attack_enemy",
+    "should_lasso",
+    "protecc_strat",
+    "normal_move",
+    "plan_moves",
+    "plan_spawns",
+    "get_distance_field",
+)
 
 
 class Bot:
-    def __init__(self) -> None:
-        pass
+    def __init__(
+        self,
+        tick_budget: float = TICK_BUDGET,
+        unit_budget: float = UNIT_BUDGET,
+        profiler: Optional[Profiler] = None,
+    ) -> None:
+        self.tick_budget = tick_budget
+        self.unit_budget = unit_budget
+        # Distance fields left from the previous tick, repaired with the
+        # TickDiff when asked for (the current ones are in the QueryCache)
+        self.previous_fields: Dict[Query, DistanceField] = {}
+        self.previous_tick: Optional[Tick] = None
+        self.tick_diff: Optional[TickDiff] = None
+
+        self.profiler = profiler or Profiler.from_env()
+        if self.profiler is not None:
+            for stage in PROFILED_STAGES:
+                setattr(self, stage, self.profiler.wrap(stage, getattr(self, stage)))
 
     def get_next_moves(self, tick: Tick) -> List[CommandAction]:
+        if self.profiler is not None:
+            self.profiler.start_tick(tick.tick)
         try:
             return self._get_next_moves(tick)
         except Exception:
-            traceback.print_exc()
+            logger.exception("Could not compute the next moves")
             return []
+        finally:
+            cache = tick.get_query_cache()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Query cache %s", cache.stats())
+            if self.profiler is not None:
+                self.profiler.count("query_cache_hits", sum(cache.hits.values()))
+                self.profiler.count("query_cache_misses", sum(cache.misses.values()))
+                summary = self.profiler.end_tick()
+                logger.info("Tick %s took %.1f ms", tick.tick, summary["ms"])
+
+    def end_game(self) -> None:
+        if self.profiler is not None:
+            self.profiler.dump()
 
     def _get_next_moves(self, tick: Tick) -> List[CommandAction]:
+        started = time.perf_counter()
+        deadline = started + self.tick_budget
+        # The units that walk are planned last, keep them some time
+        loop_deadline = deadline - self.tick_budget * PLAN_MOVES_SHARE
+        # Only costs as much as the cells that changed since the last tick
+        self.update_from_previous_tick(tick)
         my_team = tick.get_teams_by_id()[tick.teamId]
-        actions = []
-        tick_map = tick.map
-        diamonds = tick_map.diamonds
+
+        # Cheap moves first, so every unit does something even if we run late
+        actions = {unit.id: self.fallback_move(tick, unit) for unit in my_team.units}
+        # Units that just walk somewhere, planned together after the loop
+        movers: List[Unit] = []
+        spawn_targets: Dict[str, Position] = {}
+        if time.perf_counter() < loop_deadline:
+            spawn_targets = self.plan_spawns(
+                tick, [unit for unit in my_team.units if not unit.hasSpawned]
+            )
+        else:
+            logger.warning("Out of time, spawning at random")
 
         for unit in my_team.units:
-            log(f"{unit.id=} ", end="")
+            now = time.perf_counter()
+            if now >= loop_deadline:
+                logger.warning("Out of time at %s, keeping the fallback moves", unit.id)
+                break
+            unit_deadline = min(loop_deadline, now + self.unit_budget)
+
             enemy = self.can_attack_enemy(unit.position, tick)
+            action = None
 
             if tick.tick == tick.totalTick - 1 and unit.hasDiamond:
-                log("try_dropping")
+                logger.debug("%s: try_dropping", unit.id)
                 action = self.try_dropping(tick, unit)
             # S'il reste unit a spawner, la faire spawner
             elif not unit.hasSpawned:
-                log("spawn")
-                target, diamond = self.get_spawn_near_diamond(tick, diamonds)
-                diamonds = [d for d in diamonds if d.id != diamond]
-                action = CommandAction(
-                    action=CommandType.SPAWN,
-                    unitId=unit.id,
-                    target=target,
-                )
+                logger.debug("%s: spawn", unit.id)
+                if unit.id in spawn_targets:
+                    action = CommandAction(
+                        action=CommandType.SPAWN,
+                        unitId=unit.id,
+                        target=spawn_targets[unit.id],
+                    )
             elif unit.isSummoning:
-                log("summoning, do nothing")
+                logger.debug("%s: summoning, do nothing", unit.id)
                 action = CommandAction(
                     action=CommandType.NONE,
                     unitId=unit.id,
                 )
             elif unit.hasDiamond:
-                log("protecc_strat")
-                action = self.protecc_strat(tick, unit)
+                logger.debug("%s: protecc_strat", unit.id)
+                action = self.protecc_strat(tick, unit, unit_deadline)
             elif enemy is not None:
-                log("attack")
+                logger.debug("%s: attack", unit.id)
                 action = CommandAction(
                     action=CommandType.ATTACK, unitId=unit.id, target=enemy
                 )
-            elif self.should_lasso(tick, unit):
-                log("vine")
+            elif time.perf_counter() >= unit_deadline:
+                logger.debug("%s: out of time, fallback", unit.id)
+            elif (lasso_victim := self.should_lasso(tick, unit)) is not None:
+                logger.debug("%s: vine", unit.id)
                 action = CommandAction(
                     action=CommandType.VINE,
                     unitId=unit.id,
-                    target=self.should_lasso(tick, unit).position,
+                    target=lasso_victim.position,
                 )
+            elif time.perf_counter() >= unit_deadline:
+                logger.debug("%s: out of time, fallback", unit.id)
             else:
-                log("normal_move")
-                target = self.normal_move(tick, unit.position)
-                action = CommandAction(
-                    action=CommandType.MOVE,
-                    unitId=unit.id,
-                    target=target,
+                logger.debug("%s: normal_move", unit.id)
+                movers.append(unit)
+
+            if action is not None:
+                actions[unit.id] = action
+
+        if movers:
+            if time.perf_counter() >= deadline:
+                logger.warning("Out of time, %s units keep their fallback", len(movers))
+            else:
+                actions.update(self.plan_moves(tick, movers, actions, deadline))
+        return list(actions.values())
+
+    def plan_moves(
+        self,
+        tick: Tick,
+        movers: List[Unit],
+        actions: Dict[str, CommandAction],
+        deadline: Optional[float] = None,
+    ) -> Dict[str, CommandAction]:
+        """
+        Plan the moving units together: every unit gets its own lying diamond
+        (closest pairs first), and the cells each unit will walk through are
+        reserved so the next units don't walk into them. Units left without
+        a diamond, or stuck, fall back on normal_move. Past the deadline the
+        units not planned yet are left out (they keep their fallback).
+        """
+        tick_map = tick.map
+        grid = tick_map.get_grid()
+        static_map = grid.static_map
+        positions = tick_map.get_positions()
+        unit_by_id = tick.get_index().unit_by_id
+        mover_ids = {unit.id for unit in movers}
+
+        # Where the rest of the team will be next tick
+        reservations = ReservationTable()
+        for unit_id, action in actions.items():
+            if unit_id in mover_ids:
+                continue
+            if action.action in (CommandType.MOVE, CommandType.SPAWN):
+                reservations.reserve(grid.index(action.target.x, action.target.y))
+            elif unit_by_id[unit_id].position is not None:
+                position = unit_by_id[unit_id].position
+                reservations.reserve(grid.index(position.x, position.y))
+
+        targets = [
+            grid.index(d.position.x, d.position.y)
+            for d in tick_map.diamonds
+            if self.who_is_holding_this_diamond(tick, d) is None
+        ]
+        no_spawn_by_unit = {
+            unit.id: tick_map.get_tile_type_at(unit.position) != TileType.SPAWN
+            for unit in movers
+        }
+        costs: Dict[str, Dict[int, int]] = {}
+        for unit in movers:
+            cell = grid.index(unit.position.x, unit.position.y)
+            no_spawn = no_spawn_by_unit[unit.id]
+            costs[unit.id] = {}
+            for target in targets:
+                dist = static_map.distance_row(target, no_spawn)[cell]
+                if dist != UNREACHABLE:
+                    costs[unit.id][target] = dist
+        assignment = assign_targets(costs)
+        logger.debug("plan_moves assignment=%s", assignment)
+
+        # The units closest to their diamond choose their path first
+        movers = sorted(
+            movers,
+            key=lambda unit: (
+                unit.id not in assignment,
+                costs[unit.id].get(assignment.get(unit.id), 0),
+            ),
+        )
+        planned: Dict[str, CommandAction] = {}
+        for n, unit in enumerate(movers):
+            if deadline is not None and time.perf_counter() >= deadline:
+                logger.warning(
+                    "Out of time, %s units keep their fallback", len(movers) - n
+                )
+                break
+            cell = grid.index(unit.position.x, unit.position.y)
+            step = None
+            if unit.id in assignment:
+                step = self.reserve_step(
+                    tick,
+                    assignment[unit.id],
+                    no_spawn_by_unit[unit.id],
+                    cell,
+                    reservations,
+                )
+                if step is None:
+                    step = self.reserve_searched_step(
+                        tick,
+                        unit.position,
+                        positions[assignment[unit.id]],
+                        no_spawn_by_unit[unit.id],
+                        reservations,
+                    )
+
+            if step is None:
+                position = self.normal_move(tick, unit.position)
+                if not self.is_free_step(tick, unit.position, position, reservations):
+                    # Better to wait than to lose the turn on an error
+                    logger.debug("%s: cannot go to %s, wait", unit.id, position)
+                    reservations.reserve(cell)
+                    planned[unit.id] = CommandAction(
+                        action=CommandType.NONE, unitId=unit.id
+                    )
+                    continue
+                step = grid.index(position.x, position.y)
+                reservations.reserve(step)
+
+            planned[unit.id] = CommandAction(
+                action=CommandType.MOVE,
+                unitId=unit.id,
+                target=positions[step],
+            )
+        return planned
+
+    def reserve_searched_step(
+        self,
+        tick: Tick,
+        position: Position,
+        target: Position,
+        no_spawn: bool,
+        reservations: ReservationTable,
+    ) -> Optional[int]:
+        """
+        When the static table leads into a diamond or a unit, search a path
+        around the diamonds with A* instead. Its path gets reserved.
+        """
+        length, path = self.shortest_path(tick, position, target, no_spawn)
+        if length < 2 or not self.is_free_step(tick, position, path[1], reservations):
+            return None
+        grid = tick.map.get_grid()
+        cells = [grid.index(p.x, p.y) for p in path[1:]]
+        reservations.reserve_path(cells)
+        return cells[0]
+
+    def is_free_step(
+        self,
+        tick: Tick,
+        position: Position,
+        target: Position,
+        reservations: ReservationTable,
+    ) -> bool:
+        """Whether the server would accept the move, given our reservations"""
+        grid = tick.map.get_grid()
+        if not grid.in_bound(target.x, target.y):
+            return False
+        if abs(position.x - target.x) + abs(position.y - target.y) != 1:
+            return False
+        i = grid.index(target.x, target.y)
+        no_spawn = tick.map.get_tile_type_at(position) != TileType.SPAWN
+        static_map = grid.static_map
+        walkable = static_map.walkable_no_spawn if no_spawn else static_map.walkable
+        return (
+            walkable[i] == 1
+            and reservations.is_free(i)
+            and target not in tick.get_index().unit_at
+        )
+
+    def reserve_step(
+        self,
+        tick: Tick,
+        target: int,
+        no_spawn: bool,
+        cell: int,
+        reservations: ReservationTable,
+    ) -> Optional[int]:
+        """
+        Next cell on a shortest path from cell to target, free next tick and
+        clashing the least with the reserved paths. Its path gets reserved.
+
+        The distances come from the static table (shared by the whole game,
+        and already used for the assignment), so no search runs here. They
+        ignore the diamonds, only the step itself is checked against them.
+        """
+        grid = tick.map.get_grid()
+        static_map = grid.static_map
+        row = static_map.distance_row(target, no_spawn)
+        dist = row[cell]
+        if dist == UNREACHABLE or dist == 0:
+            return None
+        walkable = grid.walkable_no_spawn if no_spawn else grid.walkable
+        positions = tick.map.get_positions()
+        unit_at = tick.get_index().unit_at
+
+        best_step = None
+        best_path: List[int] = []
+        best_conflicts = 0
+        for step in static_map.neighbors(cell):
+            if (
+                row[step] != dist - 1
+                or not (walkable[step] or step == target)
+                or not reservations.is_free(step)
+                or positions[step] in unit_at
+            ):
+                continue
+            path = static_map.descend(row, step, reservations.horizon)
+            conflicts = reservations.conflicts(path)
+            if best_step is None or conflicts < best_conflicts:
+                best_step, best_path, best_conflicts = step, path, conflicts
+
+        if best_step is not None:
+            reservations.reserve_path(best_path)
+        return best_step
+
+    def update_from_previous_tick(self, tick: Tick) -> None:
+        """
+        Diff the tick with the previous one, and reuse what was derived from
+        the previous tick when only a few diamonds moved: the Grid is patched
+        and the distance fields are repaired on demand.
+        """
+        # The fields of two ticks ago that weren't repaired, nothing points
+        # to them anymore
+        for field in self.previous_fields.values():
+            field.release()
+        self.tick_diff = TickDiff(self.previous_tick, tick)
+        if self.tick_diff.same_map:
+            tick.map._grid = Grid.from_previous(
+                self.previous_tick.map.get_grid(), self.tick_diff.changed_cells
+            )
+            self.previous_fields = self.previous_tick.get_query_cache().of_kind(
+                DISTANCE_FIELD
+            )
+        else:
+            self.previous_fields = {}
+        self.previous_tick = tick
+
+    def fallback_move(self, tick: Tick, unit: Unit) -> CommandAction:
+        """Move that costs next to nothing to compute, used when out of time"""
+        if not unit.hasSpawned:
+            return CommandAction(
+                action=CommandType.SPAWN,
+                unitId=unit.id,
+                target=self.get_random_spawn_position(tick.map),
+            )
+        if unit.hasDiamond and tick.tick == tick.totalTick - 1:
+            return self.try_dropping(tick, unit)
+        if not unit.hasDiamond and not unit.isSummoning:
+            enemy = self.can_attack_enemy(unit.position, tick)
+            if enemy is not None:
+                return CommandAction(
+                    action=CommandType.ATTACK, unitId=unit.id, target=enemy
                 )
-            actions.append(action)
-        return actions
+        return CommandAction(action=CommandType.NONE, unitId=unit.id)
 
-    def protecc_strat(self, tick: Tick, unit: Unit) -> CommandAction:
+    def protecc_strat(
+        self, tick: Tick, unit: Unit, deadline: Optional[float] = None
+    ) -> CommandAction:
         # You got a diamond
         # OBJECTIVE: SURVIVE
-        tick_map = tick.map
-        diamonds = tick_map.diamonds
-        # This looks shit, but it is 4am
-        diamond = [d for d in diamonds if d.id == unit.diamondId][0]
+        diamond = tick.get_index().diamond_by_id[unit.diamondId]
+
+        if deadline is not None:
+            action = self.search_carrier_action(tick, unit, diamond, deadline)
+            if action is not None:
+                return action
 
         dist = self.check_dist_from_enemy(tick, unit.position)
-        log(f"{unit.id} {unit.position} {dist=}")
+        logger.debug("%s %s dist=%s", unit.id, unit.position, dist)
         # ! This function seems fishy, kinda doesn't work
         # check if enough time to summon
         # TODO make sure they can't vine
@@ -118,6 +450,71 @@ class Bot:
 
         return action
 
+    def search_carrier_action(
+        self, tick: Tick, unit: Unit, diamond: Diamond, deadline: float
+    ) -> Optional[CommandAction]:
+        """
+        Expectimax lookahead over the carrier and the closest enemies (see
+        carrier_search.py), None if not even one tick deep was searched.
+        """
+        started = time.perf_counter()
+        grid = tick.map.get_grid()
+        no_spawn = tick.map.get_tile_type_at(unit.position) != TileType.SPAWN
+        walkable = grid.walkable_no_spawn if no_spawn else grid.walkable
+        carrier = grid.index(unit.position.x, unit.position.y)
+
+        # Only the enemies that can walk to us before the search horizon
+        boards = tick.get_bitboards()
+        near_enemies = boards.enemies & boards.map.reachable(
+            boards.map.bit(unit.position.x, unit.position.y),
+            boards.map.walkable,
+            SEARCH_RADIUS,
+        )
+
+        # Every other unit stands still as far as the search knows, the near
+        # enemies it leaves out are blocked by CarrierSearch
+        blocked = bytearray(w ^ 1 for w in walkable)
+        for cell in iter_cells(boards.units & ~near_enemies):
+            if cell != carrier:
+                blocked[cell] = 1
+
+        search = CarrierSearch(
+            grid.static_map,
+            blocked,
+            carrier,
+            diamond.summonLevel,
+            tick.gameConfig.maximumDiamondSummonLevel,
+            list(iter_cells(near_enemies)),
+            tick.totalTick - tick.tick - 1,
+            min(deadline, started + CARRIER_SEARCH_BUDGET),
+        )
+        best, depth = search.best_action()
+        if self.profiler is not None:
+            self.profiler.record(
+                "carrier_search", time.perf_counter() - started, nodes=search.nodes
+            )
+        logger.debug(
+            "%s: carrier search depth=%s nodes=%s best=%s",
+            unit.id,
+            depth,
+            search.nodes,
+            best,
+        )
+
+        if best is None:
+            return None
+        if best == STAY:
+            return CommandAction(action=CommandType.NONE, unitId=unit.id)
+        if best == SUMMON:
+            return CommandAction(action=CommandType.SUMMON, unitId=unit.id)
+        if best == DROP:
+            return self.try_dropping(tick, unit)
+        return CommandAction(
+            action=CommandType.MOVE,
+            unitId=unit.id,
+            target=tick.map.get_positions()[best],
+        )
+
     def check_dist_from_enemy(self, tick: Tick, unit_position: Position) -> int:
         # tick_map = tick.map
         # my_units = [team.units for team in tick.teams if team == tick.teamId][0]
@@ -127,14 +524,16 @@ class Bot:
         if len(my_units_pos) == 0:
             return 69420
 
-        def pred(u: Position) -> bool:
-            return u in my_units_pos
-
-        dist, path = self.dijkstra(tick, unit_position, pred)
+        # Enemies walk over diamonds to pick them up, so the threat map
+        # distance ignores them (walls only)
+        threat_map = tick.get_threat_map()
+        height = threat_map.static_map.height
+        dist = threat_map.enemy_dist[unit_position.x * height + unit_position.y]
 
-        if dist == -1:
+        if dist == UNREACHABLE:
             return 0xDEADBEEF
-        return dist
+        # Same unit as the old dijkstra: number of tiles in the path
+        return dist + 1
 
     def try_dropping(self, tick: Tick, unit: Unit) -> CommandAction:
         empty_tile = self.find_empty_tile_around_unit(unit.position, tick)
@@ -149,8 +548,6 @@ class Bot:
     def find_empty_tile_around_unit(
         self, unit_position: Position, tick: Tick
     ) -> Optional[Position]:
-        tick_map = tick.map
-        units = [unit for team in tick.teams for unit in team.units if unit.position]
         x = unit_position.x
         y = unit_position.y
         combs = [
@@ -161,13 +558,16 @@ class Bot:
         ]
         random.shuffle(combs)
 
-        for (x, y) in combs:
-            pos = Position(x, y)
-            if not self.validate_tile_exists(tick_map, pos):
-                continue
-            if tick_map.get_tile_type_at(pos) == TileType.EMPTY:
-                if all(unit.position != pos for unit in units):
-                    return pos
+        boards = tick.get_bitboards()
+        map_boards = boards.map
+        free = (
+            map_boards.neighbors(map_boards.bit(unit_position.x, unit_position.y))
+            & map_boards.empty
+            & ~boards.units
+        )
+        for x, y in combs:
+            if map_boards.in_bound(x, y) and free & map_boards.bit(x, y):
+                return Position(x, y)
         return None
 
     def can_attack_enemy(
@@ -180,47 +580,53 @@ class Bot:
             return None
         x = unit_position.x
         y = unit_position.y
+        boards = tick.get_bitboards()
+        map_boards = boards.map
+        # Enemies on an EMPTY tile next to us, usually none
+        targets = (
+            map_boards.neighbors(map_boards.bit(x, y))
+            & boards.enemies
+            & map_boards.empty
+        )
+        if not targets:
+            return None
 
-        for team in tick.teams:
-            if team.id == tick.teamId:
-                continue
-            for unit in team.units:
-                if (
-                    unit.position is None
-                    or tick_map.get_tile_type_at(unit.position) != TileType.EMPTY
-                ):
-                    continue
-                if unit.position == Position(x - 1, y):
-                    return unit.position
-                elif unit.position == Position(x + 1, y):
-                    return unit.position
-                elif unit.position == Position(x, y - 1):
-                    return unit.position
-                elif unit.position == Position(x, y + 1):
-                    return unit.position
+        for position in (
+            Position(x - 1, y),
+            Position(x + 1, y),
+            Position(x, y - 1),
+            Position(x, y + 1),
+        ):
+            if map_boards.in_bound(position.x, position.y) and (
+                targets & map_boards.bit(position.x, position.y)
+            ):
+                return position
         return None
 
     def run_away(self, tick: Tick, unit_position: Position) -> Position:
-        # TODO STOP RUNNING AWAY FROM THIS FUNCTION AND COMPLETE IT
-        # TODO make sure to not line up for a vine
-        # the unit will get stuck in a corner
-        # When an enemy is near a unit, move in the opposite direction
-        enemy_pos = self.find_nearest_enemy(tick, unit_position)
-        if enemy_pos is not None:
-            dx = unit_position.x - enemy_pos.x
-            dy = unit_position.y - enemy_pos.y
-
-            x = unit_position.x
-            y = unit_position.y
-
-            if abs(dx) > abs(dy):
-                x += 1 if dx > 0 else -1
-            else:
-                y += 1 if dy > 0 else -1
-
-            position = Position(x, y)
-            if self.validate_tile_exists(tick.map, position):
-                return position
+        # Step to the free neighbour the enemies are the furthest from, out
+        # of attack and vine range if possible
+        threat_map = tick.get_threat_map()
+        grid = tick.map.get_grid()
+        positions = tick.map.get_positions()
+        unit_at = tick.get_index().unit_at
+        no_spawn = tick.map.get_tile_type_at(unit_position) != TileType.SPAWN
+        walkable = grid.walkable_no_spawn if no_spawn else grid.walkable
+
+        best = None
+        best_threat = None
+        for v in grid.neighbors(grid.index(unit_position.x, unit_position.y)):
+            position = positions[v]
+            if not walkable[v] or position in unit_at:
+                continue
+            threat = (
+                threat_map.attack[v] or threat_map.vine[v],
+                -threat_map.reach[v],
+            )
+            if best is None or threat < best_threat:
+                best, best_threat = position, threat
+        if best is not None:
+            return best
         return self.force_move(tick, unit_position)
 
     # Returns diamond's position (old name: get_diamond_nearest_unit)
@@ -253,106 +659,158 @@ class Bot:
     def _normal_move(
         self, tick: Tick, unit_position: Position, target_pos: List[Position]
     ) -> Optional[Position]:
-        log("_normal_move")
         tick_map = tick.map
         if len(target_pos):
-
-            def pred(u: Position) -> bool:
-                return u == unit_position
-
-            def key(e: Tuple[int, Position]) -> int:
-                if e[0] == -1:
-                    return 420420420420
-                return e[0]
-
+            grid = tick_map.get_grid()
             no_spawn = tick_map.get_tile_type_at(unit_position) != TileType.SPAWN
 
-            _, path = min(
-                (
-                    self.dijkstra(tick, position, pred, no_spawn=no_spawn)
-                    for position in target_pos
-                ),
-                key=key,
+            field = self.get_distance_field(tick, target_pos, no_spawn=no_spawn)
+            query = Query(
+                FIELD_PATH,
+                grid.index(unit_position.x, unit_position.y),
+                tuple(field.sources),
+                no_spawn,
+            )
+            cells = tick.get_query_cache().get(query, lambda: field.path(query.start))
+            positions = tick_map.get_positions()
+            path = [positions[i] for i in cells]
+
+            logger.debug(
+                "_normal_move target_pos=%s no_spawn=%s path=%s",
+                target_pos,
+                no_spawn,
+                path,
             )
-
-            log(f"_normal_move {target_pos=} {no_spawn=} {path=}")
             pos = None
             if len(path) >= 2:
-                pos = path[-2]
+                pos = path[1]
             elif len(path):
                 pos = path[0]
 
             if (
                 pos is not None
                 and self.validate_tile_exists(tick_map, pos)
-                and all(
-                    unit.position != pos for team in tick.teams for unit in team.units
-                )
+                and pos not in tick.get_index().unit_at
             ):
                 return pos
 
         return None
 
     def force_move(self, tick: Tick, unit_position: Position) -> Position:
-        log("force_move")
+        logger.debug("force_move")
         tick_map = tick.map
         width = tick_map.get_map_size_x()
         height = tick_map.get_map_size_y()
+        unit_at = tick.get_index().unit_at
 
         for neighbor in self.get_neighbors(unit_position, width, height):
             if self.validate_tile_exists(tick_map, neighbor):
                 # and tick_map.get_tile_type_at(neighbor) == TileType.EMPTY
-                if any(
-                    unit.position == neighbor
-                    for team in tick.teams
-                    for unit in team.units
-                ):
+                if neighbor in unit_at:
                     continue
         else:
             return neighbor
 
         return Position(0, 0)
 
-    def get_spawn_near_diamond(
-        self, tick: Tick, diamonds: List[Diamond]
-    ) -> Tuple[Position, str]:
-        """Return the position of the spawn and its nearest diamond"""
-        # units = tick.get_teams_by_id()[tick.teamId].units
-        tick_map = tick.map
-        if len(diamonds) == 0:
-            diamonds = tick.map.diamonds
-
-        min_dist = 9999999
-        min_spawn = self.get_random_spawn_position(tick.map)
-        min_diamond = None
-
-        # spawn tile le plus proche d'un diam
-        def pred(u: Position) -> bool:
-            return tick_map.get_tile_type_at(u) == TileType.SPAWN and any(
-                unit.position == u for team in tick.teams for unit in team.units
-            )
-
-        for diamond in diamonds:
-            dist, path = self.dijkstra(tick, diamond.position, pred)
-            if dist == -1:
-                continue
-            if dist < min_dist:
-                min_dist = dist
-                min_spawn = path[-1]
-                min_diamond = diamond.id
+    def plan_spawns(self, tick: Tick, units: List[Unit]) -> Dict[str, Position]:
+        """
+        Free spawn for each unit, all at once: the closest (spawn, diamond)
+        pairs first with every spawn and diamond used once, then the closest
+        free spawns to any diamond. Distances come from the spawn x diamond
+        matrix of the StaticMap, only diamonds on new cells cost a BFS.
+        """
+        if not units:
+            return {}
+        static_map = tick.map.get_static_map()
+        boards = tick.get_bitboards()
+        spawns = static_map.spawns
+        free_spawns = boards.map.spawns & ~boards.units
+
+        pairs = []
+        for d, diamond in enumerate(tick.map.diamonds):
+            cell = diamond.position.x * static_map.height + diamond.position.y
+            for k, dist in enumerate(static_map.spawn_distances(cell)):
+                if dist != UNREACHABLE and free_spawns >> spawns[k] & 1:
+                    pairs.append((dist, k, d))
+        pairs.sort()
+
+        targets: Dict[str, Position] = {}
+        used_spawns = set()
+        used_diamonds = set()
+        remaining = list(units)
+        for distinct_diamonds in (True, False):
+            for _, k, d in pairs:
+                if not remaining:
+                    break
+                if k in used_spawns or (distinct_diamonds and d in used_diamonds):
+                    continue
+                used_spawns.add(k)
+                used_diamonds.add(d)
+                targets[remaining.pop(0).id] = Position(
+                    *divmod(spawns[k], static_map.height)
+                )
 
-        return min_spawn, min_diamond
+        for unit in remaining:
+            # No free spawn reaches a diamond
+            targets[unit.id] = self.get_random_spawn_position(tick.map)
+        logger.debug("plan_spawns %s", targets)
+        return targets
 
     def get_random_spawn_position(self, tick_map: TickMap) -> Position:
-        spawns: List[Position] = []
+        static_map = tick_map.get_static_map()
+        spawns = static_map.spawns
+
+        spawn = spawns[random.randint(0, len(spawns) - 1)]
+        return tick_map.get_positions()[spawn]
+
+    def get_distance_field(
+        self, tick: Tick, sources: List[Position], no_spawn: bool = False
+    ) -> DistanceField:
+        """Multi-source BFS from sources, shared by every query of the tick"""
+        grid = tick.map.get_grid()
+        query = Query(
+            DISTANCE_FIELD, -1, tuple(grid.index(p.x, p.y) for p in sources), no_spawn
+        )
+
+        def compute() -> DistanceField:
+            started = time.perf_counter()
+            field = self.pop_previous_field(query)
+            if field is not None:
+                field.repair(grid, self.tick_diff.changed_cells, query.targets)
+                stage = "distance_field_repair"
+            else:
+                field = DistanceField(grid, query.targets, no_spawn=no_spawn)
+                stage = "distance_field"
+            if self.profiler is not None:
+                # get_distance_field is timed by its wrapper, cache hits
+                # included, the BFS and the repair get their own stages
+                self.profiler.record(
+                    stage, time.perf_counter() - started, field.expanded
+                )
+                self.profiler.add_nodes("get_distance_field", field.expanded)
+            return field
 
-        for x in range(tick_map.get_map_size_x()):
-            for y in range(tick_map.get_map_size_y()):
-                position = Position(x, y)
-                if tick_map.get_tile_type_at(position) == TileType.SPAWN:
-                    spawns.append(position)
+        return tick.get_query_cache().get(query, compute)
 
-        return spawns[random.randint(0, len(spawns) - 1)]
+    def pop_previous_field(self, query: Query) -> Optional[DistanceField]:
+        """
+        Field of the previous tick worth repairing for query: same no_spawn and
+        at least half of the sources in common, otherwise a fresh BFS is
+        cheaper than undoing the old one.
+        """
+        wanted = set(query.targets)
+        best_key = None
+        best_shared = 0
+        for previous_key in self.previous_fields:
+            if previous_key.no_spawn != query.no_spawn:
+                continue
+            shared = len(wanted.intersection(previous_key.targets))
+            if shared > best_shared:
+                best_key, best_shared = previous_key, shared
+        if best_key is None or best_shared * 2 < len(wanted):
+            return None
+        return self.previous_fields.pop(best_key)
 
     def get_neighbors(
         self, u: Position, width: int, height: int
@@ -366,136 +824,71 @@ class Bot:
             Position(x, y + 1),
         )
 
-    def backtrace(
-        self, prev: Dict[Tuple[int, int], Tuple[int, int]], u: Tuple[int, int]
-    ) -> Tuple[int, List[Position]]:
-        path = [Position(*u)]
-        while u in prev:
-            u = prev[u]
-            path.append(Position(*u))
-
-        path.reverse()
-        return len(path), path
-
-    def dijkstra(
-        self,
-        tick: Tick,
-        start: Position,
-        pred: Callable[[Position], bool],
-        no_spawn: bool = False,
+    def shortest_path(
+        self, tick: Tick, start: Position, goal: Position, no_spawn: bool = False
     ) -> Tuple[int, List[Position]]:
         """
-        https://en.wikipedia.org/wiki/Dijkstra%27s_algorithm
-        https://pythonalgos.com/dijkstras-algorithm-in-5-steps-with-python/
-
-        >>> bot = Bot()
-        >>> tiles = [["EMPTY" for _ in range(10)] for _ in range(10)]
-        >>> tiles[1] = ["SPAWN"] * 9 + ["EMPTY"]
-        >>> tick_map = TickMap(tiles=tiles, diamonds=[])
-        >>> def pred(u: Position) -> bool: return u == Position(9, 9)
-        >>> bot.dijkstra(tick_map, Position(0, 0), pred, no_spawn=True)
+        Path from start to goal (number of tiles, tiles), the goal may be a
+        diamond. Searched toward the goal with A*, on our maps it expands
+        fewer cells than dijkstra or search.bidirectional_search even on long
+        paths (python -m benchmarks.search).
         """
-        tick_map = tick.map
-        width = tick_map.get_map_size_x()
-        height = tick_map.get_map_size_y()
-
-        dist = [[-1 for _ in range(width)] for _ in range(height)]
-        dist[start.y][start.x] = 0
-        prev: Dict[Tuple[int, int], Tuple[int, int]] = {}
-        visited = set()
-        queue = [(0, (start.x, start.y))]
-
-        while len(queue):
-            # log(queue)
-            _dist, curr = heapq.heappop(queue)
-            # log(f"{curr=}")
-
-            if curr in visited:
-                continue
-
-            visited.add(curr)
-            cx, cy = curr
-
-            if pred(Position(cx, cy)):
-                return self.backtrace(prev, curr)
-
-            for v in self.get_neighbors(Position(cx, cy), width, height):
-                x, y = v.x, v.y
-                if not self.check_if_walkable_cell(tick, v, no_spawn):
-                    continue
+        grid = tick.map.get_grid()
+        query = Query(
+            PATH,
+            grid.index(start.x, start.y),
+            (grid.index(goal.x, goal.y),),
+            no_spawn,
+        )
 
-                new_dist = dist[cy][cx] + 1
-                if dist[y][x] == -1 or new_dist < dist[y][x]:
-                    dist[y][x] = new_dist
-                    prev[(x, y)] = curr
-                    heapq.heappush(queue, (dist[y][x], (x, y)))
+        def compute() -> List[int]:
+            started = time.perf_counter()
+            path, expanded = astar(grid, query.start, query.targets[0], no_spawn)
+            if self.profiler is not None:
+                self.profiler.record("astar", time.perf_counter() - started, expanded)
+            return path
 
-        return -1, []
+        path = tick.get_query_cache().get(query, compute)
+        if not path:
+            return -1, []
+        positions = tick.map.get_positions()
+        return len(path), [positions[i] for i in path]
 
     def check_if_walkable_cell(self, tick: Tick, v: Position, no_spawn: bool) -> bool:
-        tick_map = tick.map
-        if not self.validate_tile_in_bound(tick_map, v):
-            return False
-        elif no_spawn and tick_map.get_tile_type_at(v) != TileType.EMPTY:
-            return False
-        elif tick_map.get_tile_type_at(v) == TileType.WALL:
-            return False
-        elif self.is_there_a_diamond_there(tick, v):
-            return False
-        # elif any(unit.position == v for team in tick.teams for unit in team.units):
-        #     log([unit.position == v for team in tick.teams for unit in team.units])
-        #     return False
-        return True
+        return tick.map.get_grid().is_walkable(v.x, v.y, no_spawn)
 
     def validate_tile_in_bound(self, tick_map: TickMap, position: Position) -> bool:
-        return not (
-            position.x < 0
-            or position.y < 0
-            or position.x >= tick_map.get_map_size_x()
-            or position.y >= tick_map.get_map_size_y()
-        )
+        return tick_map.get_grid().in_bound(position.x, position.y)
 
     def validate_tile_exists(self, tick_map: TickMap, position: Position) -> bool:
+        grid = tick_map.get_grid()
         return (
-            self.validate_tile_in_bound(tick_map, position)
-            and tick_map.get_tile_type_at(position) != TileType.WALL
+            grid.in_bound(position.x, position.y)
+            and grid.tiles[grid.index(position.x, position.y)] != WALL
         )
 
     def are_we_first(self, tick: Tick, tick_number: str) -> bool:
-        return bool(tick.teamPlayOrderings[tick_number][0] == tick.teamId)
+        return tick.get_turn_order().is_first(int(tick_number), tick.teamId)
 
     def are_we_before_another_team_next_turn(self, tick: Tick, e_teamId: str) -> bool:
         if tick.tick + 1 >= tick.totalTick:
             return False
-        teamPlayOrderings = tick.teamPlayOrderings[str(tick.tick + 1)]
-        return teamPlayOrderings.index(tick.teamId) < teamPlayOrderings.index(e_teamId)
+        return tick.get_turn_order().plays_before(tick.tick + 1, tick.teamId, e_teamId)
 
     def get_nb_of_turn_order_generated(self, tick: Tick) -> int:
         return len(tick.teams) ** 2
 
     def get_nb_of_turns_until_order_generation(self, tick: Tick) -> int:
-        last_turn_order_generated = int(list(tick.teamPlayOrderings.keys())[-1])
-        return last_turn_order_generated - tick.tick
+        return tick.get_turn_order().last_generated - tick.tick
 
     def get_nb_of_turns_where_we_are_first_in_a_row(self, tick: Tick) -> int:
-        x = 0
-        for turn, order in tick.teamPlayOrderings.items():
-            if order[0] == tick.teamId:
-                x += 1
-            else:
-                return x
-        return x
+        turn_order = tick.get_turn_order()
+        return turn_order.first_in_a_row(turn_order.first_tick, tick.teamId)
 
     def who_is_holding_this_diamond(
         self, tick: Tick, diamond: Diamond
     ) -> Optional[Unit]:
-        # Diamond.ownerId be like
-        for team in tick.teams:
-            for unit in team.units:
-                if unit.hasDiamond:
-                    if unit.position == diamond.position:
-                        return unit
-        return None
+        return tick.get_index().get_holder(diamond)
 
     def find_nearest_enemy(
         self, tick: Tick, unit_position: Position
@@ -506,63 +899,46 @@ class Bot:
         if len(enemy_units) == 0:
             return None
 
-        def pred(u: Position) -> bool:
-            return u == unit_position
+        grid = tick.map.get_grid()
+        enemy_positions = [
+            unit.position for unit in enemy_units if unit.position is not None
+        ]
+        query = Query(
+            NEAREST_ENEMY,
+            grid.index(unit_position.x, unit_position.y),
+            tuple(grid.index(p.x, p.y) for p in enemy_positions),
+            True,
+        )
 
-        def key(e: Tuple[int, Position]) -> int:
-            if e[0] == -1:
-                return 420420420420
-            return e[0]
+        def compute() -> int:
+            field = self.get_distance_field(tick, enemy_positions, no_spawn=True)
+            return field.nearest(query.start)
 
-        _, path = min(
-            (
-                self.dijkstra(tick, unit.position, pred, no_spawn=True)
-                for unit in enemy_units
-                if unit.position is not None
-            ),
-            key=key,
-        )
+        nearest = tick.get_query_cache().get(query, compute)
 
-        if len(path):
-            return path[0]
+        if nearest != -1:
+            return tick.map.get_positions()[nearest]
         return None
 
     def get_enemy_units(self, tick: Tick) -> List[Unit]:
-        return [
-            unit
-            for team in tick.teams
-            for unit in team.units
-            if team.id != tick.teamId and unit.position
-        ]
+        return tick.get_index().enemy_units
 
     def can_lasso_list(self, tick: Tick, unit: Unit) -> List[Unit]:
         enemy_units = self.get_enemy_units(tick)
-        can_lasso_units = []
-        u_pos: Position = unit.position
+        grid = tick.map.get_grid()
+        enemy_cells = tuple(grid.index(e.position.x, e.position.y) for e in enemy_units)
+        query = Query(
+            LASSO_TARGETS, grid.index(unit.position.x, unit.position.y), enemy_cells
+        )
 
-        for e_unit in enemy_units:
-            if (
-                e_unit.position.x == u_pos.x
-                and tick.map.get_tile_type_at(e_unit.position) == TileType.EMPTY
-            ):
-                min_y = min(u_pos.y, e_unit.position.y)
-                max_y = max(u_pos.y, e_unit.position.y)
-                if all(
-                    tick.map.get_tile_type_at(Position(u_pos.x, y)) == TileType.EMPTY
-                    and not self.is_there_a_diamond_there(tick, Position(u_pos.x, y))
-                    for y in range(min_y, max_y + 1)
-                ):
-                    can_lasso_units.append(e_unit)
-            elif e_unit.position.y == u_pos.y:
-                min_x = min(u_pos.x, e_unit.position.x)
-                max_x = max(u_pos.x, e_unit.position.x)
-                if all(
-                    tick.map.get_tile_type_at(Position(x, u_pos.y)) == TileType.EMPTY
-                    and not self.is_there_a_diamond_there(tick, Position(x, u_pos.y))
-                    for x in range(min_x, max_x + 1)
-                ):
-                    can_lasso_units.append(e_unit)
-        return can_lasso_units
+        def compute() -> List[Unit]:
+            return [
+                e_unit
+                for e_unit, e_index in zip(enemy_units, enemy_cells)
+                if grid.is_line_clear(query.start, e_index)
+            ]
+
+        return tick.get_query_cache().get(query, compute)
 
     def should_lasso(self, tick: Tick, unit: Unit) -> Optional[Unit]:
         if unit.hasDiamond:
@@ -576,31 +952,9 @@ class Bot:
         return None
 
     def is_there_a_diamond_there(self, tick: Tick, position: Position) -> bool:
-        return any(d.position == position for d in tick.map.diamonds)
+        return position in tick.get_index().diamond_at
 
     def are_we_in_lasso_danger_zone(self, tick: Tick, unit: Unit) -> bool:
-        enemy_units = self.get_enemy_units(tick)
-        threats = []
-        for e_unit in enemy_units:
-            if (
-                abs(e_unit.position.x - unit.position.x) < 2
-                and tick.map.get_tile_type_at(e_unit.position) != TileType.SPAWN
-            ):
-                min_y = min(unit.position.y, e_unit.position.y)
-                max_y = max(unit.position.y, e_unit.position.y)
-                if all(
-                    tick.map.get_tile_type_at(Position(unit.position.x, y))
-                    == TileType.EMPTY
-                    for y in range(min_y, max_y + 1)
-                ):
-                    threats.append(e_unit)
-            elif abs(e_unit.position.y - unit.position.y) < 2:
-                min_x = min(unit.position.x, e_unit.position.x)
-                max_x = max(unit.position.x, e_unit.position.x)
-                if all(
-                    tick.map.get_tile_type_at(Position(x, unit.position.y))
-                    == TileType.EMPTY
-                    for x in range(min_x, max_x + 1)
-                ):
-                    threats.append(e_unit)
-        return threats != []
+        threat_map = tick.get_threat_map()
+        height = threat_map.static_map.height
+        return threat_map.vine[unit.position.x * height + unit.position.y] == 1
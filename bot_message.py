@@ -1,7 +1,11 @@
 from dataclasses import dataclass
 from dataclasses_json import dataclass_json
 from enum import Enum
+from functools import lru_cache
 from typing import List
+import json
+
+from game_command import CommandAction, CommandType
 
 
 class MessageType(Enum):
@@ -15,3 +19,54 @@ class BotMessage:
     type: MessageType
     actions: List = None
     tick: int = None
+
+
+# Pre-encoded JSON fragments so encode_bot_message never touches the enums
+_MESSAGE_TYPES = {t: json.dumps(t.value) for t in MessageType}
+_ACTIONS = {
+    a: '{"action": ' + json.dumps(a.value) + ', "unitId": ' for a in CommandType
+}
+
+
+@lru_cache(maxsize=4096)
+def _encode_string(value: str) -> str:
+    # Unit ids and the action type are the same every tick
+    return json.dumps(value)
+
+
+def encode_action(action: CommandAction) -> str:
+    target = action.target
+    if target is None:
+        encoded_target = "null"
+    else:
+        encoded_target = '{"x": %d, "y": %d}' % (target.x, target.y)
+    return (
+        _ACTIONS[action.action]
+        + _encode_string(action.unitId)
+        + ', "target": '
+        + encoded_target
+        + ', "type": '
+        + _encode_string(action.type)
+        + "}"
+    )
+
+
+def encode_bot_message(message: BotMessage) -> str:
+    """
+    Same output as message.to_json(), but written directly instead of
+    building the intermediate dicts through dataclasses_json.
+    """
+    if message.actions is None:
+        actions = "null"
+    else:
+        actions = "[" + ", ".join(map(encode_action, message.actions)) + "]"
+    tick = "null" if message.tick is None else str(message.tick)
+    return (
+        '{"type": '
+        + _MESSAGE_TYPES[message.type]
+        + ', "actions": '
+        + actions
+        + ', "tick": '
+        + tick
+        + "}"
+    )
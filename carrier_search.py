@@ -0,0 +1,251 @@
+"""
+Lookahead for a unit carrying a diamond: expectimax over our moves and the
+replies of the closest enemies, a few ticks deep.
+
+A state is a flat tuple of small ints, (carrier, level, summoning, enemies)
+with cells as grid indices and enemies a sorted tuple of cells, so it is
+cheap to build, to copy and to use as a transposition table key.
+
+The enemy model is rough on purpose: an enemy next to the carrier attacks
+it, one lined up with it vines it half of the time, otherwise it steps
+toward the carrier (Manhattan distance) with probability CHASE or stays.
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from map_cache import EMPTY, StaticMap
+
+# Actions of the carrier besides moving to a cell
+STAY = -1
+SUMMON = -2
+DROP = -3
+
+CHASE = 0.7
+VINE = 0.5
+# Value of getting caught, in ticks of a level 1 diamond
+CAUGHT = -10.0
+# Enemies further than this (Manhattan) are left out of the search
+SEARCH_RADIUS = 12
+MAX_ENEMIES = 2
+MAX_DEPTH = 8
+
+State = Tuple[int, int, int, Tuple[int, ...]]
+
+
+class OutOfTime(Exception):
+    pass
+
+
+class CarrierSearch:
+    def __init__(
+        self,
+        static_map: StaticMap,
+        blocked: bytearray,
+        carrier: int,
+        level: int,
+        max_level: int,
+        enemies: Sequence[int],
+        ticks_left: int,
+        deadline: float,
+    ) -> None:
+        """
+        blocked marks the cells the carrier can't move to besides the walls
+        (diamonds, the units that aren't in enemies, spawns when it stands on
+        an EMPTY tile). The enemies left out of the search are added to it, it
+        is modified. ticks_left is the number of ticks still scored after
+        this one.
+        """
+        self.static_map = static_map
+        self.height = static_map.height
+        self.blocked = blocked
+        self.max_level = max_level
+        self.ticks_left = ticks_left
+        self.deadline = deadline
+        self.nodes = 0
+        self.horizon = 0
+        self.table: Dict[Tuple[State, int], float] = {}
+        # Memoized per cell or per (enemy, carrier) pair, the search keeps
+        # coming back to the same few cells
+        self._neighbors: Dict[int, List[int]] = {}
+        self._replies: Dict[Tuple[int, int], Tuple[int, bool, int]] = {}
+
+        cx, cy = divmod(carrier, self.height)
+        near = sorted(
+            (abs(cx - x) + abs(cy - y), e)
+            for e in enemies
+            for x, y in (divmod(e, self.height),)
+        )
+        self.root: State = (
+            carrier,
+            level,
+            0,
+            tuple(sorted(e for d, e in near[:MAX_ENEMIES] if d <= SEARCH_RADIUS)),
+        )
+        # They don't move in the search, but still stand in the way
+        for e in enemies:
+            if e not in self.root[3]:
+                blocked[e] = 1
+
+    def best_action(self) -> Tuple[Optional[int], int]:
+        """
+        Iterative deepening until the deadline. Returns the best action of the
+        deepest finished search (a cell, STAY, SUMMON or DROP, None if not even
+        depth 1 finished) and that depth.
+        """
+        best = None
+        depth = 0
+        try:
+            for d in range(1, min(MAX_DEPTH, self.ticks_left) + 1):
+                # The leaves are valued from the horizon, so is the table
+                self.horizon = d
+                self.table = {}
+                _, action = self._max_value(self.root, d)
+                best, depth = action, d
+        except OutOfTime:
+            pass
+        return best, depth
+
+    def _actions(self, state: State) -> List[int]:
+        carrier, level, summoning, enemies = state
+        if summoning:
+            return [STAY]
+        actions = [STAY]
+        if level < self.max_level:
+            actions.append(SUMMON)
+        tiles = self.static_map.tiles
+        can_drop = False
+        for v in self.neighbors(carrier):
+            if v in enemies:
+                continue
+            if not self.blocked[v] and self.static_map.walkable[v]:
+                actions.append(v)
+            if tiles[v] == EMPTY and not self.blocked[v]:
+                can_drop = True
+        if can_drop:
+            actions.append(DROP)
+        return actions
+
+    def _max_value(self, state: State, depth: int) -> Tuple[float, Optional[int]]:
+        self.nodes += 1
+        if self.nodes & 511 == 0 and time.perf_counter() >= self.deadline:
+            raise OutOfTime()
+        if depth == 0:
+            return self._leaf(state), None
+        key = (state, depth)
+        if key in self.table:
+            return self.table[key], None
+
+        carrier, level, summoning, enemies = state
+        best_value = None
+        best_action = None
+        for action in self._actions(state):
+            if action == DROP:
+                # Safe, but the diamond stops scoring for us
+                value = 0.0
+            else:
+                if action == SUMMON:
+                    next_summoning = level
+                    next_carrier = carrier
+                elif action == STAY:
+                    next_summoning = summoning
+                    next_carrier = carrier
+                else:
+                    next_summoning = summoning
+                    next_carrier = action
+                next_level = level
+                if next_summoning:
+                    next_summoning -= 1
+                    if next_summoning == 0:
+                        next_level += 1
+                value = self._chance_value(
+                    next_carrier, next_level, next_summoning, enemies, depth
+                )
+            if best_value is None or value > best_value:
+                best_value, best_action = value, action
+
+        self.table[key] = best_value
+        return best_value, best_action
+
+    def _chance_value(
+        self,
+        carrier: int,
+        level: int,
+        summoning: int,
+        enemies: Tuple[int, ...],
+        depth: int,
+    ) -> float:
+        """Value after our move, averaged over the replies of the enemies"""
+        safe = 1.0
+        # (probability, cell) alternatives of each enemy that doesn't catch us
+        moves: List[List[Tuple[float, int]]] = []
+        for e in enemies:
+            reply = self._replies.get((e, carrier))
+            if reply is None:
+                reply = self._replies[(e, carrier)] = self._reply(e, carrier)
+            distance, lined_up, step = reply
+            if distance == 1:
+                return CAUGHT
+            if lined_up:
+                safe *= 1 - VINE
+
+            if step == e:
+                moves.append([(1.0, e)])
+            elif distance > 2 * depth + 1:
+                # Too far to matter before the horizon, no need to branch
+                moves.append([(1.0, step)])
+            else:
+                moves.append([(CHASE, step), (1 - CHASE, e)])
+
+        outcomes: List[Tuple[float, Tuple[int, ...]]] = [(1.0, ())]
+        for alternatives in moves:
+            outcomes = [
+                (p * q, cells + (cell,))
+                for p, cells in outcomes
+                for q, cell in alternatives
+            ]
+
+        value = 0.0
+        for p, cells in outcomes:
+            next_state = (carrier, level, summoning, tuple(sorted(cells)))
+            future, _ = self._max_value(next_state, depth - 1)
+            value += p * (level + future)
+        return (1 - safe) * CAUGHT + safe * value
+
+    def neighbors(self, i: int) -> List[int]:
+        neighbors = self._neighbors.get(i)
+        if neighbors is None:
+            neighbors = self._neighbors[i] = self.static_map.neighbors(i)
+        return neighbors
+
+    def _reply(self, e: int, carrier: int) -> Tuple[int, bool, int]:
+        """Distance of enemy e to the carrier, if it can vine it, its next cell"""
+        static_map = self.static_map
+        height = self.height
+        cx, cy = divmod(carrier, height)
+        ex, ey = divmod(e, height)
+        distance = abs(cx - ex) + abs(cy - ey)
+
+        step = e
+        no_spawn = static_map.tiles[e] == EMPTY
+        walkable = static_map.walkable_no_spawn if no_spawn else static_map.walkable
+        for v in self.neighbors(e):
+            vx, vy = divmod(v, height)
+            if walkable[v] and v != carrier and abs(cx - vx) + abs(cy - vy) < distance:
+                step = v
+                break
+        return distance, static_map.is_line_clear(e, carrier), step
+
+    def _leaf(self, state: State) -> float:
+        """Points we can hope for past the horizon: until an enemy gets here"""
+        carrier, level, _, enemies = state
+        ticks_left = self.ticks_left - self.horizon
+        if not enemies:
+            return float(level * ticks_left)
+        cx, cy = divmod(carrier, self.height)
+        nearest = min(
+            abs(cx - x) + abs(cy - y)
+            for e in enemies
+            for x, y in (divmod(e, self.height),)
+        )
+        return float(level * min(ticks_left, nearest // 2))
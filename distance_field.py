@@ -0,0 +1,182 @@
+import heapq
+from typing import Iterable, List, Optional, Sequence
+
+from grid import Grid
+from search_buffers import get_search_buffers
+
+
+class DistanceField:
+    """
+    Distance from every cell to the nearest of several sources, computed with
+    a single multi-source BFS (every move costs 1, so no priority queue).
+
+    For a cell index i:
+    - dist[i] is the number of moves to the nearest source, -1 if unreachable
+    - label[i] is the index in sources of that nearest source
+    - prev[i] is the next cell on the way to it, -1 for sources
+
+    expanded is the number of cells the BFS, or the last repair, went through
+    (for the profiler).
+    """
+
+    def __init__(self, grid: Grid, sources: Sequence[int], no_spawn: bool = False):
+        self.grid = grid
+        self.sources = list(sources)
+        self.no_spawn = no_spawn
+
+        walkable = grid.walkable_no_spawn if no_spawn else grid.walkable
+        # The lists of the fields released by the Bot, see release
+        buffers = get_search_buffers(grid.width * grid.height)
+        dist = buffers.take_list()
+        label = buffers.take_list()
+        prev = buffers.take_list()
+        adjacency = grid.static_map.adjacency
+
+        queue = buffers.queue
+        tail = 0
+        for n, source in enumerate(self.sources):
+            if dist[source] == -1:
+                dist[source] = 0
+                label[source] = n
+                queue[tail] = source
+                tail += 1
+
+        head = 0
+        while head < tail:
+            u = queue[head]
+            head += 1
+            new_dist = dist[u] + 1
+            u_label = label[u]
+            for v in adjacency[u]:
+                if walkable[v] and dist[v] == -1:
+                    dist[v] = new_dist
+                    label[v] = u_label
+                    prev[v] = u
+                    queue[tail] = v
+                    tail += 1
+
+        self.dist = dist
+        self.label = label
+        self.prev = prev
+        self.expanded = tail
+
+    def repair(
+        self,
+        grid: Grid,
+        changed_cells: Iterable[int],
+        sources: Optional[Sequence[int]] = None,
+    ) -> None:
+        """
+        Update the field in place for the grid of the next tick, when only the
+        walkability of changed_cells (see TickDiff) and some of the sources
+        changed.
+
+        Cells whose path went through a cell that got blocked, or ended on a
+        source that is gone, are invalidated and filled again from their
+        valid neighbours. Newly walkable cells and new sources push their
+        shorter distances outwards. Only the affected part of the map is
+        visited.
+        """
+        self.grid = grid
+        walkable = grid.walkable_no_spawn if self.no_spawn else grid.walkable
+        dist = self.dist
+        label = self.label
+        prev = self.prev
+        changed_cells = list(changed_cells)
+
+        old_sources = self.sources
+        if sources is None:
+            sources = old_sources
+        sources = list(sources)
+        first_label = {}
+        for n, source in enumerate(sources):
+            first_label.setdefault(source, n)
+        removed = [
+            source
+            for n, source in enumerate(old_sources)
+            if dist[source] == 0 and label[source] == n and source not in first_label
+        ]
+
+        # Invalidate the subtrees hanging from cells that got blocked and from
+        # the sources that are gone
+        invalid = []
+        stack = [i for i in changed_cells if not walkable[i] and dist[i] > 0]
+        stack.extend(removed)
+        while stack:
+            u = stack.pop()
+            if dist[u] == -1:
+                continue
+            for v in grid.neighbors(u):
+                if prev[v] == u and dist[v] != -1:
+                    stack.append(v)
+            dist[u] = -1
+            label[u] = -1
+            prev[u] = -1
+            invalid.append(u)
+
+        if sources != old_sources:
+            relabel = [first_label.get(source, -1) for source in old_sources]
+            for i, n in enumerate(label):
+                if n != -1:
+                    label[i] = relabel[n]
+            self.sources = sources
+
+        queue = []
+        settled = 0
+        for source, n in first_label.items():
+            if dist[source] != 0:
+                settled += 1
+                dist[source] = 0
+                label[source] = n
+                prev[source] = -1
+                for v in grid.neighbors(source):
+                    if walkable[v] and (dist[v] == -1 or dist[v] > 1):
+                        heapq.heappush(queue, (1, v, source))
+
+        # Reseed the invalidated and the newly walkable cells from their
+        # valid neighbours, then propagate like Dijkstra
+        for u in invalid + [i for i in changed_cells if walkable[i]]:
+            if not walkable[u] or dist[u] == 0:
+                continue
+            for v in grid.neighbors(u):
+                if dist[v] != -1:
+                    heapq.heappush(queue, (dist[v] + 1, u, v))
+
+        while queue:
+            d, u, parent = heapq.heappop(queue)
+            if dist[u] != -1 and dist[u] <= d:
+                continue
+            if dist[parent] + 1 != d:
+                # The parent was improved or invalidated since
+                continue
+            dist[u] = d
+            label[u] = label[parent]
+            prev[u] = parent
+            settled += 1
+            for v in grid.neighbors(u):
+                if walkable[v] and (dist[v] == -1 or dist[v] > d + 1):
+                    heapq.heappush(queue, (d + 1, v, u))
+        self.expanded = len(invalid) + settled
+
+    def release(self) -> None:
+        """Give the lists back for the next fields, the field is unusable after"""
+        buffers = get_search_buffers(len(self.dist))
+        for values in (self.dist, self.label, self.prev):
+            buffers.give_back(values)
+        self.dist = self.label = self.prev = []
+
+    def nearest(self, i: int) -> int:
+        """Cell index of the nearest source, -1 if unreachable"""
+        if self.dist[i] == -1:
+            return -1
+        return self.sources[self.label[i]]
+
+    def path(self, i: int) -> List[int]:
+        """Cells from i to its nearest source (both included), [] if unreachable"""
+        if self.dist[i] == -1:
+            return []
+        path = [i]
+        while self.prev[i] != -1:
+            i = self.prev[i]
+            path.append(i)
+        return path
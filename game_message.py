@@ -1,9 +1,18 @@
 from __future__ import annotations
 
+import json
 from dataclasses import dataclass
 from dataclasses_json import dataclass_json
 from enum import Enum
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Union
+
+from bitboard import TickBitboards
+from grid import Grid
+from map_cache import StaticMap, get_static_map
+from query_cache import QueryCache
+from threat_map import ThreatMap
+from tick_index import TickIndex
+from turn_order import TurnOrder
 
 
 class TileType(Enum):
@@ -28,9 +37,17 @@ class UnitRole(Enum):
 @dataclass_json
 @dataclass(frozen=True)
 class Position:
+    # No __dict__, there are a lot of these (see get_positions)
+    __slots__ = ("x", "y")
+
     x: int
     y: int
 
+    def __reduce__(self):
+        # The default pickling of a slotted class sets the fields back one by
+        # one, which a frozen dataclass refuses
+        return Position, (self.x, self.y)
+
 
 @dataclass_json
 @dataclass
@@ -68,6 +85,40 @@ class TickMap:
         else:
             raise Exception("Not a valid tile")
 
+    def get_static_map(self) -> StaticMap:
+        """Tile data shared by every tick of the game"""
+        try:
+            return self._static_map
+        except AttributeError:
+            self._static_map = get_static_map(self.tiles)
+            return self._static_map
+
+    def get_grid(self) -> Grid:
+        """Compiled tile codes and walkability masks, built once per tick"""
+        try:
+            return self._grid
+        except AttributeError:
+            self._grid = Grid(
+                self.get_static_map(), [d.position for d in self.diamonds]
+            )
+            return self._grid
+
+    def get_positions(self) -> List[Position]:
+        """
+        The Position of every cell index, built once per map and kept on the
+        StaticMap, so going from a cell to a Position is a list lookup
+        """
+        static_map = self.get_static_map()
+        try:
+            return static_map._positions
+        except AttributeError:
+            static_map._positions = [
+                Position(x, y)
+                for x in range(static_map.width)
+                for y in range(static_map.height)
+            ]
+            return static_map._positions
+
 
 @dataclass_json
 @dataclass
@@ -138,3 +189,127 @@ class Tick:
 
     def get_teams_by_id(self) -> Dict[str, Team]:
         return {team.id: team for team in self.teams}
+
+    def get_index(self) -> TickIndex:
+        """Unit and diamond lookups, built once per tick"""
+        try:
+            return self._index
+        except AttributeError:
+            self._index = TickIndex(self)
+            return self._index
+
+    def get_turn_order(self) -> TurnOrder:
+        """teamPlayOrderings as a rank table, built by decode_tick"""
+        try:
+            return self._turn_order
+        except AttributeError:
+            self._turn_order = TurnOrder(self.teamPlayOrderings)
+            return self._turn_order
+
+    def get_bitboards(self) -> TickBitboards:
+        """All units and the enemy units as bitboards, built once per tick"""
+        try:
+            return self._bitboards
+        except AttributeError:
+            self._bitboards = TickBitboards(self)
+            return self._bitboards
+
+    def get_threat_map(self) -> ThreatMap:
+        """Enemy reach, attack and vine danger per cell, built once per tick"""
+        try:
+            return self._threat_map
+        except AttributeError:
+            self._threat_map = ThreatMap(self)
+            return self._threat_map
+
+    def get_query_cache(self) -> QueryCache:
+        """Answers of the path and enemy queries, shared for the whole tick"""
+        try:
+            return self._query_cache
+        except AttributeError:
+            self._query_cache = QueryCache()
+            return self._query_cache
+
+
+def decode_tick(message: Union[str, bytes]) -> Tick:
+    """
+    Decode a raw server message into a Tick.
+
+    Gives the same objects as Tick.from_dict(json.loads(message)), but builds
+    them directly instead of going through the dataclasses_json reflection for
+    every nested Team, Unit, Diamond and Position. The tiles are compiled into
+    the StaticMap right away, and ticks of the same game share its tiles list.
+    """
+    return tick_from_dict(json.loads(message))
+
+
+def tick_from_dict(data: Dict[str, Any]) -> Tick:
+    tick = Tick(
+        tick=data["tick"],
+        totalTick=data["totalTick"],
+        teamId=data["teamId"],
+        teams=[_decode_team(team) for team in data["teams"]],
+        map=_decode_map(data["map"]),
+        gameConfig=GameConfig(
+            pointsPerDiamond=data["gameConfig"]["pointsPerDiamond"],
+            maximumDiamondSummonLevel=data["gameConfig"]["maximumDiamondSummonLevel"],
+            initialDiamondSummonLevel=data["gameConfig"]["initialDiamondSummonLevel"],
+        ),
+        teamPlayOrderings=data["teamPlayOrderings"],
+    )
+    tick._turn_order = TurnOrder(tick.teamPlayOrderings)
+    return tick
+
+
+def _decode_position(data: Optional[Dict[str, int]]) -> Optional[Position]:
+    if data is None:
+        return None
+    return Position(data["x"], data["y"])
+
+
+def _decode_map(data: Dict[str, Any]) -> TickMap:
+    static_map = get_static_map(data["tiles"])
+    tick_map = TickMap(
+        tiles=static_map.raw_tiles,
+        diamonds=[
+            Diamond(
+                id=diamond["id"],
+                position=Position(diamond["position"]["x"], diamond["position"]["y"]),
+                summonLevel=diamond["summonLevel"],
+                points=diamond["points"],
+                ownerId=diamond.get("ownerId"),
+            )
+            for diamond in data["diamonds"]
+        ],
+    )
+    tick_map._static_map = static_map
+    return tick_map
+
+
+def _decode_team(data: Dict[str, Any]) -> Team:
+    return Team(
+        id=data["id"],
+        name=data["name"],
+        score=data["score"],
+        units=[_decode_unit(unit) for unit in data["units"]],
+        errors=data["errors"],
+    )
+
+
+def _decode_unit(data: Dict[str, Any]) -> Unit:
+    last_state = data.get("lastState") or {}
+    return Unit(
+        id=data["id"],
+        teamId=data["teamId"],
+        path=[Position(p["x"], p["y"]) for p in data["path"]],
+        hasDiamond=data["hasDiamond"],
+        hasSpawned=data["hasSpawned"],
+        isSummoning=data["isSummoning"],
+        lastState=TickTeamUnitState(
+            wasVinedBy=last_state.get("wasVinedBy"),
+            positionBefore=_decode_position(last_state.get("positionBefore")),
+            wasAttackedBy=last_state.get("wasAttackedBy"),
+        ),
+        diamondId=data.get("diamondId"),
+        position=_decode_position(data.get("position")),
+    )
@@ -0,0 +1,131 @@
+from array import array
+from typing import Iterable, List, Set
+
+from map_cache import EMPTY, StaticMap, is_line_clear
+
+
+class Grid:
+    """
+    Flat, compiled view of a TickMap built once per tick.
+
+    Cells are indexed with x * height + y, which matches the tiles[x][y]
+    layout sent by the server. The tile codes come from the StaticMap shared
+    by the whole game, only the diamonds are overlaid here. Walkability is
+    precomputed so the pathfinding only does a single bytearray lookup per
+    cell, and the static EMPTY segments are split at each diamond so line of
+    sight checks for vines are a segment id comparison.
+    """
+
+    def __init__(self, static_map: StaticMap, diamonds: Iterable) -> None:
+        self.static_map = static_map
+        self.width = static_map.width
+        self.height = static_map.height
+        self.tiles = static_map.tiles
+
+        self.diamonds = bytearray(static_map.size)
+        self.walkable = bytearray(static_map.walkable)
+        self.walkable_no_spawn = bytearray(static_map.walkable_no_spawn)
+        self.column_segments = array("i", static_map.column_segments)
+        self.row_segments = array("i", static_map.row_segments)
+
+        next_segment = static_map.segment_count + 1
+        for position in diamonds:
+            i = position.x * self.height + position.y
+            self.diamonds[i] = 1
+            self.walkable[i] = 0
+            self.walkable_no_spawn[i] = 0
+            next_segment = self._split_segment(self.column_segments, i, 1, next_segment)
+            next_segment = self._split_segment(
+                self.row_segments, i, self.height, next_segment
+            )
+        self.next_segment = next_segment
+
+    @classmethod
+    def from_previous(cls, previous: "Grid", changed_cells: Set[int]) -> "Grid":
+        """
+        Grid of the next tick, given the cells where a diamond appeared or
+        disappeared (see TickDiff). Only those cells, and the rows and
+        columns going through them, are recomputed.
+        """
+        grid = cls.__new__(cls)
+        static_map = previous.static_map
+        grid.static_map = static_map
+        grid.width = previous.width
+        grid.height = previous.height
+        grid.tiles = previous.tiles
+        grid.diamonds = bytearray(previous.diamonds)
+        grid.walkable = bytearray(previous.walkable)
+        grid.walkable_no_spawn = bytearray(previous.walkable_no_spawn)
+        grid.column_segments = array("i", previous.column_segments)
+        grid.row_segments = array("i", previous.row_segments)
+        grid.next_segment = previous.next_segment
+
+        columns = set()
+        rows = set()
+        for i in changed_cells:
+            diamond = grid.diamonds[i] ^ 1
+            grid.diamonds[i] = diamond
+            grid.walkable[i] = static_map.walkable[i] and not diamond
+            grid.walkable_no_spawn[i] = static_map.walkable_no_spawn[i] and not diamond
+            x, y = divmod(i, grid.height)
+            columns.add(x)
+            rows.add(y)
+
+        for x in columns:
+            grid._relabel_line(grid.column_segments, x * grid.height, 1, grid.height)
+        for y in rows:
+            grid._relabel_line(grid.row_segments, y, grid.height, grid.width)
+        return grid
+
+    def _relabel_line(
+        self, segments: array, start: int, step: int, length: int
+    ) -> None:
+        """Number again the EMPTY, diamond free runs of one row or column"""
+        tiles = self.tiles
+        diamonds = self.diamonds
+        previous_clear = False
+        i = start
+        for _ in range(length):
+            if tiles[i] == EMPTY and not diamonds[i]:
+                if not previous_clear:
+                    self.next_segment += 1
+                segments[i] = self.next_segment
+                previous_clear = True
+            else:
+                segments[i] = 0
+                previous_clear = False
+            i += step
+
+    def _split_segment(
+        self, segments: array, i: int, step: int, next_segment: int
+    ) -> int:
+        """Block cell i and give the rest of its segment a new id"""
+        old = segments[i]
+        if old == 0:
+            return next_segment
+        segments[i] = 0
+        j = i + step
+        while j < len(segments) and segments[j] == old:
+            segments[j] = next_segment
+            j += step
+        return next_segment + 1
+
+    def index(self, x: int, y: int) -> int:
+        return x * self.height + y
+
+    def in_bound(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_walkable(self, x: int, y: int, no_spawn: bool = False) -> bool:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        walkable = self.walkable_no_spawn if no_spawn else self.walkable
+        return walkable[x * self.height + y] == 1
+
+    def is_line_clear(self, a: int, b: int) -> bool:
+        """Like StaticMap.is_line_clear, diamonds also block the line"""
+        return is_line_clear(self.column_segments, self.row_segments, self.height, a, b)
+
+    def neighbors(self, i: int) -> List[int]:
+        """Same order as Bot.get_neighbors: left, up, right, down"""
+        return self.static_map.neighbors(i)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Run many bot sessions from a single process, for tests and scrimmages.
+
+python host.py --sessions 8                  # registers UwUBot-0 to UwUBot-7
+python host.py --token abc --token def       # one session per token
+
+Every session has its own websocket and Bot, but they share the interpreter,
+the imports and the static map cache, so sessions playing on the same map
+only compile it once.
+With BOT_PROFILE=profile.json every session writes its own
+profile-<team name>.json (profile-session-<n>.json for the token sessions).
+"""
+
+import argparse
+import asyncio
+from typing import List, Optional, Tuple
+
+from application import DEFAULT_URI, run
+from log import get_logger
+from profiler import Profiler
+
+logger = get_logger("host")
+
+
+async def run_session(
+    uri: str, index: int, team_name: Optional[str], token: Optional[str]
+) -> Optional[BaseException]:
+    name = team_name or f"session-{index}"
+    logger.info("Starting %s", name)
+    # One BOT_PROFILE file per session, they would overwrite each other
+    profiler = Profiler.from_env(suffix=name)
+    try:
+        await run(uri, team_name=team_name, token=token, profiler=profiler)
+    except Exception as e:
+        logger.exception("%s failed", name)
+        return e
+    logger.info("%s is over", name)
+    return None
+
+
+async def run_sessions(uri: str, sessions: List[Tuple[Optional[str], Optional[str]]]):
+    results = await asyncio.gather(
+        *(
+            run_session(uri, index, team_name, token)
+            for index, (team_name, token) in enumerate(sessions)
+        )
+    )
+    failed = sum(result is not None for result in results)
+    logger.info("%s sessions done, %s failed", len(sessions), failed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Many bot sessions in one process")
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--sessions", type=int, default=1)
+    parser.add_argument("--team-prefix", default="UwUBot")
+    parser.add_argument(
+        "--token",
+        dest="tokens",
+        action="append",
+        default=[],
+        help="register with this token, once per session",
+    )
+    args = parser.parse_args()
+
+    if args.tokens:
+        sessions = [(None, token) for token in args.tokens]
+    else:
+        sessions = [(f"{args.team_prefix}-{i}", None) for i in range(args.sessions)]
+
+    asyncio.get_event_loop().run_until_complete(run_sessions(args.uri, sessions))
+
+
+if __name__ == "__main__":
+    main()
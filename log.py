@@ -0,0 +1,70 @@
+"""
+Levelled logging for the bot, on top of the standard logging module.
+
+The level comes from the BOT_LOG_LEVEL environment variable (DEBUG, INFO,
+WARNING, ERROR, default INFO). Records are formatted, handed to a queue and
+written to stdout by a background thread, so a tick never waits on the terminal.
+
+Always pass the values as arguments, logger.debug("dist=%s", dist), and not
+as an f-string: a disabled message is then never formatted.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Optional, Union
+
+ROOT_LOGGER = "uwu"
+
+
+_handler: Optional[logging.handlers.QueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _start_listener() -> None:
+    global _listener
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    _handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_handler.queue, stream_handler)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    # Flushes what is left in the queue
+    if _listener is not None:
+        _listener.stop()
+
+
+def _setup() -> None:
+    global _handler
+    root = logging.getLogger(ROOT_LOGGER)
+    root.propagate = False
+    root.setLevel(os.environ.get("BOT_LOG_LEVEL", "INFO").upper())
+
+    # The stock QueueHandler formats the message before queueing it, the args
+    # (lists, positions...) could change before the listener gets to it
+    _handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    root.addHandler(_handler)
+    _start_listener()
+    atexit.register(_stop_listener)
+    # The listener thread doesn't survive a fork (tournament workers)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_start_listener)
+
+
+def get_logger(name: str) -> logging.Logger:
+    if _handler is None:
+        _setup()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def set_level(level: Union[int, str]) -> None:
+    """Override BOT_LOG_LEVEL, e.g. to silence the bots in benchmarks"""
+    if _handler is None:
+        _setup()
+    logging.getLogger(ROOT_LOGGER).setLevel(level)
@@ -0,0 +1,208 @@
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from search_buffers import get_search_buffers
+
+# Tile codes stored in StaticMap.tiles
+EMPTY = 0
+WALL = 1
+SPAWN = 2
+
+TILE_CODES = {"EMPTY": EMPTY, "WALL": WALL, "SPAWN": SPAWN}
+
+# Distance table value for cells that can't be reached
+UNREACHABLE = 0xFFFF
+
+# Number of different maps kept in memory
+MAX_CACHED_MAPS = 16
+
+
+class StaticMap:
+    """
+    Everything that only depends on the tiles, which don't change during a
+    game: tile codes, wall masks, spawn list and a shortest path table.
+
+    Cells are indexed with x * height + y. The all-pairs table is filled one
+    row at a time (one BFS per source) the first time a row is needed, so
+    after the first ticks most distance queries are a single array lookup.
+    """
+
+    def __init__(self, tiles: List[List[str]]) -> None:
+        self.width = len(tiles)
+        self.height = len(tiles[0])
+        self.size = self.width * self.height
+        # Kept so every tick of the game can share the same tiles list
+        self.raw_tiles = tiles
+
+        self.tiles = bytearray(self.size)
+        i = 0
+        for column in tiles:
+            for raw_tile in column:
+                code = TILE_CODES.get(raw_tile)
+                if code is None:
+                    raise Exception(f"Tile '{raw_tile}'' is not a valid tile.")
+                self.tiles[i] = code
+                i += 1
+
+        self.walls = bytearray(tile == WALL for tile in self.tiles)
+        # Walkability without the diamonds, see Grid for the per-tick version
+        self.walkable = bytearray(tile != WALL for tile in self.tiles)
+        self.walkable_no_spawn = bytearray(tile == EMPTY for tile in self.tiles)
+        self.spawns = [i for i, tile in enumerate(self.tiles) if tile == SPAWN]
+        self._build_segments()
+        # adjacency[i] is neighbors(i), built once instead of on every call
+        self.adjacency: List[List[int]] = [self._neighbors(i) for i in range(self.size)]
+
+        # distance_rows[no_spawn][source] -> array of uint16 distances
+        self.distance_rows: Tuple[List[Optional[array]], List[Optional[array]]] = (
+            [None] * self.size,
+            [None] * self.size,
+        )
+        # spawn_columns[cell] -> distance from every spawn (same order as
+        # spawns) to cell, the spawn x diamond matrix is a column per diamond
+        self.spawn_columns: Dict[int, array] = {}
+
+    def _build_segments(self) -> None:
+        """
+        Number the runs of EMPTY tiles along each column (x fixed) and each
+        row (y fixed). Two cells of the same column or row see each other
+        (nothing but EMPTY tiles in between) iff they have the same non-zero
+        segment id. Non EMPTY cells get 0.
+        """
+        width, height = self.width, self.height
+        tiles = self.tiles
+        self.column_segments = array("i", [0]) * self.size
+        self.row_segments = array("i", [0]) * self.size
+
+        segment = 0
+        for x in range(width):
+            previous_empty = False
+            for y in range(height):
+                i = x * height + y
+                if tiles[i] == EMPTY:
+                    if not previous_empty:
+                        segment += 1
+                    self.column_segments[i] = segment
+                    previous_empty = True
+                else:
+                    previous_empty = False
+
+        for y in range(height):
+            previous_empty = False
+            for x in range(width):
+                i = x * height + y
+                if tiles[i] == EMPTY:
+                    if not previous_empty:
+                        segment += 1
+                    self.row_segments[i] = segment
+                    previous_empty = True
+                else:
+                    previous_empty = False
+
+        self.segment_count = segment
+
+    def is_line_clear(self, a: int, b: int) -> bool:
+        """True if a and b share a row or column with only EMPTY tiles between them"""
+        return is_line_clear(self.column_segments, self.row_segments, self.height, a, b)
+
+    def neighbors(self, i: int) -> List[int]:
+        """Left, up, right, down. Shared list, don't modify it"""
+        return self.adjacency[i]
+
+    def _neighbors(self, i: int) -> List[int]:
+        height = self.height
+        x, y = divmod(i, height)
+        result = []
+        if x > 0:
+            result.append(i - height)
+        if y > 0:
+            result.append(i - 1)
+        if x < self.width - 1:
+            result.append(i + height)
+        if y < height - 1:
+            result.append(i + 1)
+        return result
+
+    def distance_row(self, source: int, no_spawn: bool = False) -> array:
+        """Number of moves from source to every cell, ignoring diamonds"""
+        rows = self.distance_rows[no_spawn]
+        row = rows[source]
+        if row is None:
+            row = rows[source] = self._bfs(source, no_spawn)
+        return row
+
+    def descend(self, row: array, start: int, length: int) -> List[int]:
+        """
+        Up to length cells from start toward the source of the distance row,
+        one move closer each time (the first such neighbour)
+        """
+        path = [start]
+        dist = row[start]
+        while 0 < dist != UNREACHABLE and len(path) < length:
+            dist -= 1
+            for v in self.adjacency[path[-1]]:
+                if row[v] == dist:
+                    path.append(v)
+                    break
+        return path
+
+    def spawn_distances(self, cell: int) -> array:
+        """Moves from each spawn to cell, ignoring diamonds"""
+        column = self.spawn_columns.get(cell)
+        if column is None:
+            # Moves are reversible, one BFS from the cell gives every spawn
+            row = self.distance_row(cell)
+            column = self.spawn_columns[cell] = array(
+                "H", [row[s] for s in self.spawns]
+            )
+        return column
+
+    def _bfs(self, source: int, no_spawn: bool) -> array:
+        walkable = self.walkable_no_spawn if no_spawn else self.walkable
+        # The row is kept for the whole game, only the queue can be reused
+        dist = array("H", [UNREACHABLE]) * self.size
+        dist[source] = 0
+        queue = get_search_buffers(self.size).queue
+        queue[0] = source
+        head, tail = 0, 1
+        while head < tail:
+            u = queue[head]
+            head += 1
+            new_dist = dist[u] + 1
+            for v in self.adjacency[u]:
+                if walkable[v] and dist[v] == UNREACHABLE:
+                    dist[v] = new_dist
+                    queue[tail] = v
+                    tail += 1
+        return dist
+
+
+def is_line_clear(
+    column_segments: array, row_segments: array, height: int, a: int, b: int
+) -> bool:
+    if a // height == b // height:
+        return column_segments[a] != 0 and column_segments[a] == column_segments[b]
+    if a % height == b % height:
+        return row_segments[a] != 0 and row_segments[a] == row_segments[b]
+    return False
+
+
+# Shared by every game of the process (see host.py), so guarded by a lock
+_static_maps: Dict[Tuple[Tuple[str, ...], ...], StaticMap] = {}
+_static_maps_lock = threading.Lock()
+
+
+def get_static_map(tiles: List[List[str]]) -> StaticMap:
+    """Return the StaticMap for these tiles, building it on the first tick"""
+    key = tuple(map(tuple, tiles))
+    static_map = _static_maps.get(key)
+    if static_map is None:
+        with _static_maps_lock:
+            static_map = _static_maps.get(key)
+            if static_map is None:
+                if len(_static_maps) >= MAX_CACHED_MAPS:
+                    # Drop the oldest map, dicts keep insertion order
+                    del _static_maps[next(iter(_static_maps))]
+                static_map = _static_maps[key] = StaticMap(tiles)
+    return static_map
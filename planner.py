@@ -0,0 +1,61 @@
+from typing import Dict, Iterable, List, Set, Tuple
+
+# How many moves ahead the planned paths are reserved
+RESERVATION_HORIZON = 8
+
+
+class ReservationTable:
+    """
+    Space-time reservations of our units: (cell, t) is taken when one of our
+    units plans to be on cell t moves from now. t = 1 is the next tick, the
+    only one that can actually collide, later ones are used to spread the
+    units over equally short paths.
+    """
+
+    def __init__(self, horizon: int = RESERVATION_HORIZON) -> None:
+        self.horizon = horizon
+        self.reserved: Set[Tuple[int, int]] = set()
+
+    def is_free(self, cell: int, t: int = 1) -> bool:
+        return (cell, t) not in self.reserved
+
+    def reserve(self, cell: int, t: int = 1) -> None:
+        self.reserved.add((cell, t))
+
+    def reserve_path(self, path: Iterable[int]) -> None:
+        """Reserve path[t] at time t + 1, path starting with the next cell"""
+        for t, cell in enumerate(path, 1):
+            if t > self.horizon:
+                break
+            self.reserved.add((cell, t))
+
+    def conflicts(self, path: Iterable[int]) -> int:
+        """Number of cells of the path already taken at the same time"""
+        count = 0
+        for t, cell in enumerate(path, 1):
+            if t > self.horizon:
+                break
+            if (cell, t) in self.reserved:
+                count += 1
+        return count
+
+
+def assign_targets(costs: Dict[str, Dict[int, int]]) -> Dict[str, int]:
+    """
+    Give each unit its own target, cheapest pairs first. costs[unit][target]
+    is the number of moves, unreachable targets are left out. Units get no
+    target once every target is taken.
+    """
+    pairs: List[Tuple[int, str, int]] = sorted(
+        (cost, unit_id, target)
+        for unit_id, unit_costs in costs.items()
+        for target, cost in unit_costs.items()
+    )
+    assignment: Dict[str, int] = {}
+    taken: Set[int] = set()
+    for _, unit_id, target in pairs:
+        if unit_id in assignment or target in taken:
+            continue
+        assignment[unit_id] = target
+        taken.add(target)
+    return assignment
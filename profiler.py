@@ -0,0 +1,151 @@
+import json
+import math
+import os
+from collections import defaultdict
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional
+
+# Histogram buckets are powers of two in microseconds: [1us, 2us), [2us, 4us)...
+NB_BUCKETS = 24
+
+
+class StageStats:
+    """Calls, time and nodes expanded for one stage"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.nodes = 0
+        self.histogram = [0] * NB_BUCKETS
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float, nodes: int = 0) -> None:
+        self.calls += 1
+        self.seconds += seconds
+        self.nodes += nodes
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        bucket = 0 if seconds < 1e-6 else int(math.log2(seconds * 1e6)) + 1
+        self.histogram[min(bucket, NB_BUCKETS - 1)] += 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bound in seconds of the bucket holding the q-th percentile"""
+        rank = q * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= rank:
+                return 2**bucket * 1e-6
+        return self.max_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "total_ms": self.seconds * 1000,
+            "mean_ms": self.seconds * 1000 / self.calls if self.calls else 0,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "max_ms": self.max_seconds * 1000,
+            "nodes": self.nodes,
+            "histogram_us": {
+                f"<{2**bucket}": count
+                for bucket, count in enumerate(self.histogram)
+                if count
+            },
+        }
+
+
+class Profiler:
+    """
+    Opt-in timing of the Bot decision stages.
+
+    Enabled by setting BOT_PROFILE to an output file. When it is not set the
+    Bot has no profiler and its methods aren't wrapped at all, so the only
+    cost left is an `is not None` check in the search functions.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.stages: Dict[str, StageStats] = defaultdict(StageStats)
+        self.ticks: List[Dict[str, Any]] = []
+        self.current_tick: Optional[int] = None
+        self.tick_started = 0.0
+        self.tick_stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.tick_counters: Dict[str, int] = {}
+
+    @staticmethod
+    def from_env(suffix: Optional[str] = None) -> Optional["Profiler"]:
+        """
+        suffix goes before the extension of BOT_PROFILE (profile-UwUBot-0.json),
+        for the processes playing several games at once.
+        """
+        path = os.environ.get("BOT_PROFILE")
+        if not path:
+            return None
+        if suffix is not None:
+            root, extension = os.path.splitext(path)
+            path = f"{root}-{suffix}{extension}"
+        return Profiler(path)
+
+    def wrap(self, stage: str, func: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, perf_counter() - started)
+
+        return timed
+
+    def record(self, stage: str, seconds: float, nodes: int = 0) -> None:
+        self.stages[stage].add(seconds, nodes)
+        calls, total, total_nodes = self.tick_stages.get(stage, (0, 0.0, 0))
+        self.tick_stages[stage] = [calls + 1, total + seconds, total_nodes + nodes]
+
+    def add_nodes(self, stage: str, nodes: int) -> None:
+        """Count nodes expanded by a stage timed separately (e.g. with wrap)"""
+        self.stages[stage].nodes += nodes
+        calls, total, total_nodes = self.tick_stages.get(stage, (0, 0.0, 0))
+        self.tick_stages[stage] = [calls, total, total_nodes + nodes]
+
+    def count(self, name: str, value: int) -> None:
+        """Add to a counter that isn't a stage (e.g. query cache hits)"""
+        self.counters[name] += value
+        self.tick_counters[name] = self.tick_counters.get(name, 0) + value
+
+    def start_tick(self, tick: int) -> None:
+        self.current_tick = tick
+        self.tick_stages = {}
+        self.tick_counters = {}
+        self.tick_started = perf_counter()
+
+    def end_tick(self) -> Dict[str, Any]:
+        seconds = perf_counter() - self.tick_started
+        self.stages["tick"].add(seconds)
+        summary = {
+            "tick": self.current_tick,
+            "ms": seconds * 1000,
+            "stages": {
+                stage: {"calls": calls, "ms": total * 1000, "nodes": nodes}
+                for stage, (calls, total, nodes) in self.tick_stages.items()
+            },
+            "counters": self.tick_counters,
+        }
+        self.ticks.append(summary)
+        return summary
+
+    def dump(self) -> None:
+        """Write the per-tick summaries and the histograms, at game end"""
+        with open(self.path, "w") as f:
+            json.dump(
+                {
+                    "stages": {
+                        stage: stats.to_dict() for stage, stats in self.stages.items()
+                    },
+                    "counters": self.counters,
+                    "ticks": self.ticks,
+                },
+                f,
+                indent=2,
+            )
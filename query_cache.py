@@ -0,0 +1,82 @@
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Entries kept per tick, the least recently used go first past that
+QUERY_CACHE_SIZE = 512
+
+# Query kinds
+DISTANCE_FIELD = "distance_field"
+PATH = "path"
+FIELD_PATH = "field_path"
+NEAREST_ENEMY = "nearest_enemy"
+LASSO_TARGETS = "lasso_targets"
+
+
+class Query(NamedTuple):
+    """
+    What a search is asked, as a hashable key: the kind of query, the start
+    cell (-1 when there is none, like for a distance field), the target cells
+    and whether the spawns are walkable. Two units asking the same thing in
+    the same tick get the same answer from the QueryCache.
+    """
+
+    kind: str
+    start: int
+    targets: Tuple[int, ...]
+    no_spawn: bool = False
+
+
+class QueryCache:
+    """
+    Answers of the searches of one tick (see Tick.get_query_cache), with LRU
+    eviction and hit/miss counters per query kind.
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[Query, Any]" = OrderedDict()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.evictions = 0
+
+    def get(self, query: Query, compute: Callable[[], T]) -> T:
+        """Cached answer to query, compute() on a miss"""
+        try:
+            value = self.entries[query]
+        except KeyError:
+            self.misses[query.kind] += 1
+        else:
+            self.hits[query.kind] += 1
+            self.entries.move_to_end(query)
+            return value
+
+        value = compute()
+        self.put(query, value)
+        return value
+
+    def put(self, query: Query, value: Any) -> None:
+        self.entries[query] = value
+        self.entries.move_to_end(query)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def of_kind(self, kind: str) -> Dict[Query, Any]:
+        """Entries of one kind, least recently used first"""
+        return {
+            query: value for query, value in self.entries.items() if query.kind == kind
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "kinds": {
+                kind: {"hits": self.hits[kind], "misses": self.misses[kind]}
+                for kind in sorted(self.hits.keys() | self.misses.keys())
+            },
+        }
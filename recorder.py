@@ -0,0 +1,37 @@
+import gzip
+import json
+from typing import Iterator, Optional, Union
+
+
+class TickRecorder:
+    """
+    Write the raw tick frames of a game to a gzip compressed JSONL file, one
+    frame per line, so the game can be replayed offline with replay.py.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file: Optional[gzip.GzipFile] = gzip.open(path, "wt", encoding="utf-8")
+
+    def record(self, message: Union[str, bytes]) -> None:
+        if self.file is None:
+            return
+        if isinstance(message, bytes):
+            message = message.decode("utf-8")
+        if "\n" in message:
+            message = json.dumps(json.loads(message))
+        self.file.write(message)
+        self.file.write("\n")
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_recording(path: str) -> Iterator[str]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Feed recorded games through Bot.get_next_moves as fast as possible.
+
+python replay.py game1.jsonl.gz [game2.jsonl.gz ...] [--repeat N]
+
+Record a game by running application.py with RECORD_TICKS=game.jsonl.gz.
+"""
+
+import argparse
+import resource
+import time
+import tracemalloc
+from typing import List
+
+from bot import Bot, TICK_BUDGET, UNIT_BUDGET
+from game_message import decode_tick
+from log import set_level
+from recorder import read_recording
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recordings", nargs="+")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--tick-budget", type=float, default=TICK_BUDGET)
+    parser.add_argument("--unit-budget", type=float, default=UNIT_BUDGET)
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="report the peak of Python allocations (much slower)",
+    )
+    args = parser.parse_args()
+
+    set_level("WARNING")
+    games = [list(read_recording(path)) for path in args.recordings]
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    decode_times: List[float] = []
+    move_times: List[float] = []
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for frames in games:
+            game_bot = Bot(tick_budget=args.tick_budget, unit_budget=args.unit_budget)
+            for frame in frames:
+                t0 = time.perf_counter()
+                tick = decode_tick(frame)
+                t1 = time.perf_counter()
+                game_bot.get_next_moves(tick)
+                t2 = time.perf_counter()
+                decode_times.append(t1 - t0)
+                move_times.append(t2 - t1)
+            game_bot.end_game()
+    elapsed = time.perf_counter() - started
+
+    nb_ticks = len(move_times)
+    if nb_ticks == 0:
+        print("No ticks in the recordings")
+        return
+
+    print(f"{nb_ticks} ticks in {elapsed:.2f} s ({nb_ticks / elapsed:.1f} ticks/s)")
+    for name, times in (("decode", decode_times), ("get_next_moves", move_times)):
+        print(
+            f"{name:>15}: "
+            f"p50 {percentile(times, 0.5) * 1000:.2f} ms, "
+            f"p95 {percentile(times, 0.95) * 1000:.2f} ms, "
+            f"p99 {percentile(times, 0.99) * 1000:.2f} ms, "
+            f"max {max(times) * 1000:.2f} ms"
+        )
+    # ru_maxrss is in kilobytes on Linux
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"peak RSS: {max_rss / 1024:.1f} MB")
+    if args.tracemalloc:
+        _, peak = tracemalloc.get_traced_memory()
+        print(f"peak Python allocations: {peak / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Shortest paths on a Grid, to the nearest of several goals (dijkstra) or to
+a known target cell. Every cell but the start has to be walkable, the goal
+included, except for astar which may end on a diamond (to pick it up). They
+all return (path, expanded) with path the cells from start to goal ([] if
+unreachable) and expanded the number of cells taken out of the queue, for
+the benchmarks and the profiler.
+
+dijkstra and astar work in the SearchBuffers of the map size.
+"""
+
+import heapq
+from typing import Collection, List, Optional, Tuple
+
+from grid import Grid
+from search_buffers import SearchBuffers, get_search_buffers
+
+
+def manhattan(height: int, a: int, b: int) -> int:
+    ax, ay = divmod(a, height)
+    bx, by = divmod(b, height)
+    return abs(ax - bx) + abs(ay - by)
+
+
+def dijkstra(
+    grid: Grid,
+    start: int,
+    goals: Collection[int],
+    no_spawn: bool = False,
+    buffers: Optional[SearchBuffers] = None,
+) -> Tuple[List[int], int]:
+    """
+    Path to the nearest cell of goals, the search the old Bot.dijkstra did
+    with a pred function, kept as the baseline of the benchmarks. The start
+    itself counts if it is one of the goals.
+    """
+    walkable = grid.walkable_no_spawn if no_spawn else grid.walkable
+    if buffers is None:
+        buffers = get_search_buffers(len(walkable))
+    generation = buffers.next_generation()
+    dist, prev, seen, closed = buffers.dist, buffers.prev, buffers.seen, buffers.closed
+    adjacency = grid.static_map.adjacency
+
+    dist[start] = 0
+    prev[start] = -1
+    seen[start] = generation
+    queue = [(0, start)]
+    expanded = 0
+
+    while queue:
+        _, u = heapq.heappop(queue)
+        if closed[u] == generation:
+            continue
+        closed[u] = generation
+        expanded += 1
+        if u in goals:
+            return _backtrace(prev, u), expanded
+
+        new_dist = dist[u] + 1
+        for v in adjacency[u]:
+            if not walkable[v]:
+                continue
+            if seen[v] != generation or new_dist < dist[v]:
+                seen[v] = generation
+                dist[v] = new_dist
+                prev[v] = u
+                heapq.heappush(queue, (new_dist, v))
+
+    return [], expanded
+
+
+def astar(
+    grid: Grid,
+    start: int,
+    goal: int,
+    no_spawn: bool = False,
+    buffers: Optional[SearchBuffers] = None,
+) -> Tuple[List[int], int]:
+    """
+    A* with the Manhattan distance, which never overestimates on a 4-connected
+    grid, so the path is as short as the one of Dijkstra. Ties go to the
+    deepest cell, which heads straight for the goal on open maps.
+    """
+    walkable = grid.walkable_no_spawn if no_spawn else grid.walkable
+    height = grid.height
+    gx, gy = divmod(goal, height)
+    if buffers is None:
+        buffers = get_search_buffers(len(walkable))
+    generation = buffers.next_generation()
+    dist, prev, seen, closed = buffers.dist, buffers.prev, buffers.seen, buffers.closed
+    adjacency = grid.static_map.adjacency
+
+    dist[start] = 0
+    prev[start] = -1
+    seen[start] = generation
+    queue = [(manhattan(height, start, goal), 0, start)]
+    expanded = 0
+
+    while queue:
+        _, negative_dist, u = heapq.heappop(queue)
+        if closed[u] == generation:
+            continue
+        closed[u] = generation
+        expanded += 1
+        if u == goal:
+            return _backtrace(prev, u), expanded
+
+        new_dist = -negative_dist + 1
+        for v in adjacency[u]:
+            if (not walkable[v] and v != goal) or closed[v] == generation:
+                continue
+            if seen[v] != generation or new_dist < dist[v]:
+                seen[v] = generation
+                dist[v] = new_dist
+                prev[v] = u
+                vx, vy = divmod(v, height)
+                estimate = new_dist + abs(vx - gx) + abs(vy - gy)
+                heapq.heappush(queue, (estimate, -new_dist, v))
+
+    return [], expanded
+
+
+def bidirectional_search(
+    grid: Grid, start: int, goal: int, no_spawn: bool = False
+) -> Tuple[List[int], int]:
+    """
+    Breadth first from both ends, one whole layer at a time, always growing
+    the smaller frontier. The two searches meet around half the distance, so
+    on long paths through a maze far fewer cells are visited than by a
+    single search.
+    """
+    walkable = grid.walkable_no_spawn if no_spawn else grid.walkable
+    if start == goal:
+        return [start], 1
+    if not walkable[goal]:
+        return [], 0
+
+    size = len(walkable)
+    dist = ([-1] * size, [-1] * size)
+    prev = ([-1] * size, [-1] * size)
+    dist[0][start] = 0
+    dist[1][goal] = 0
+    frontiers = ([start], [goal])
+    expanded = 0
+
+    while frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        own_dist, other_dist = dist[side], dist[1 - side]
+        own_prev = prev[side]
+
+        # Finish the whole layer: the first meeting isn't always the best
+        best = -1
+        meeting = (-1, -1)
+        next_frontier = []
+        for u in frontiers[side]:
+            expanded += 1
+            new_dist = own_dist[u] + 1
+            for v in grid.neighbors(u):
+                if not walkable[v] and v != start:
+                    continue
+                if other_dist[v] != -1:
+                    total = new_dist + other_dist[v]
+                    if best == -1 or total < best:
+                        best = total
+                        meeting = (u, v)
+                if own_dist[v] == -1:
+                    own_dist[v] = new_dist
+                    own_prev[v] = u
+                    next_frontier.append(v)
+
+        if best != -1:
+            u, v = meeting
+            # u is on this side's tree, v on the other one
+            first = _backtrace(own_prev, u)
+            second = _backtrace(prev[1 - side], v)
+            second.reverse()
+            path = first + second
+            if side == 1:
+                path.reverse()
+            return path, expanded
+        frontiers = (
+            (next_frontier, frontiers[1])
+            if side == 0
+            else (frontiers[0], next_frontier)
+        )
+
+    return [], expanded
+
+
+def _backtrace(prev: List[int], u: int) -> List[int]:
+    """Cells from the root of the search to u"""
+    path = [u]
+    while prev[u] != -1:
+        u = prev[u]
+        path.append(u)
+    path.reverse()
+    return path
@@ -0,0 +1,61 @@
+import threading
+from typing import Dict, List
+
+# Cleared lists kept per map size for the next DistanceFields
+MAX_FREE_LISTS = 48
+
+
+class SearchBuffers:
+    """
+    Lists reused by the searches on maps of one size (see get_search_buffers),
+    instead of allocating map sized lists for every query.
+
+    dist, prev, seen and closed are never cleared: each search takes a new
+    generation, and a cell only has a dist and prev in this search if
+    seen[cell] is the current generation (closed works the same way for the
+    cells taken out of the queue). queue is the FIFO of the BFS, a cell is
+    queued at most once so size cells are enough. free_lists are lists of
+    -1 given back by the DistanceFields that are no longer used.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.generation = 0
+        self.dist = [0] * size
+        self.prev = [-1] * size
+        self.seen = [0] * size
+        self.closed = [0] * size
+        self.queue = [0] * size
+        self.minus_ones = [-1] * size
+        self.free_lists: List[List[int]] = []
+
+    def next_generation(self) -> int:
+        self.generation += 1
+        return self.generation
+
+    def take_list(self) -> List[int]:
+        """A list of size -1, recycled when possible"""
+        if self.free_lists:
+            return self.free_lists.pop()
+        return self.minus_ones.copy()
+
+    def give_back(self, values: List[int]) -> None:
+        if len(values) == self.size and len(self.free_lists) < MAX_FREE_LISTS:
+            values[:] = self.minus_ones
+            self.free_lists.append(values)
+
+
+# One set of buffers per thread and map size, host.py plays several games in
+# the same process and a search isn't reentrant
+_local = threading.local()
+
+
+def get_search_buffers(size: int) -> SearchBuffers:
+    try:
+        by_size: Dict[int, SearchBuffers] = _local.by_size
+    except AttributeError:
+        by_size = _local.by_size = {}
+    buffers = by_size.get(size)
+    if buffers is None:
+        buffers = by_size[size] = SearchBuffers(size)
+    return buffers
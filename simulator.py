@@ -0,0 +1,490 @@
+#!/usr/bin/env python
+"""
+In-process approximation of the game server, for self-play without a
+websocket.
+
+python simulator.py [--games N] [--size 30] [--teams 4] [--units 4] [--ticks 100]
+
+Rules, as we understood them from the game documentation:
+- teams play one after the other, in the order of teamPlayOrderings for the
+  tick, and their actions are applied in the order they were sent
+- SPAWN puts an unspawned unit on a free SPAWN tile
+- MOVE goes to an adjacent free tile that isn't a wall. Units on an EMPTY
+  tile can't go back onto a SPAWN tile. Walking on a diamond picks it up.
+- SUMMON makes the carrier busy for summonLevel ticks, after which the
+  diamond gains a level (up to maximumDiamondSummonLevel)
+- DROP puts the carried diamond on an adjacent free EMPTY tile
+- VINE pulls a unit standing in a straight line of free EMPTY tiles next to
+  the viner, which takes its diamond if it has none
+- ATTACK sends an adjacent enemy back to the unspawned state, its diamond is
+  left where it stood
+- at the end of every tick, each carried diamond gives its points to the
+  team of its carrier
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List, Optional, Sequence
+
+from game_command import CommandAction, CommandType
+from game_message import (
+    Diamond,
+    GameConfig,
+    Position,
+    Team,
+    Tick,
+    TickMap,
+    TickTeamUnitState,
+    Unit,
+)
+from map_cache import EMPTY, SPAWN, WALL, get_static_map
+
+POINTS_PER_DIAMOND = 10
+MAXIMUM_DIAMOND_SUMMON_LEVEL = 5
+INITIAL_DIAMOND_SUMMON_LEVEL = 1
+
+
+def generate_tiles(width: int, height: int, rng: random.Random) -> List[List[str]]:
+    """Random map with walls, and spawns on the left and right borders"""
+    tiles = [["EMPTY"] * height for _ in range(width)]
+    for x in range(width):
+        for y in range(height):
+            if x in (0, width - 1):
+                if rng.random() < 0.4:
+                    tiles[x][y] = "SPAWN"
+            elif rng.random() < 0.12:
+                tiles[x][y] = "WALL"
+    for x in (0, width - 1):
+        if "SPAWN" not in tiles[x]:
+            tiles[x][height // 2] = "SPAWN"
+    return tiles
+
+
+class Simulator:
+    """
+    Game state kept in flat lists indexed by unit and diamond number, with
+    cells indexed x * height + y like the rest of the bot. Tick objects are
+    only built when a bot asks for one.
+    """
+
+    def __init__(
+        self,
+        tiles: List[List[str]],
+        team_ids: Sequence[str],
+        nb_units: int = 4,
+        nb_diamonds: int = 8,
+        total_ticks: int = 100,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.rng = random.Random(seed)
+        self.tiles = tiles
+        self.static_map = get_static_map(tiles)
+        self.width = self.static_map.width
+        self.height = self.static_map.height
+        self.team_ids = list(team_ids)
+        self.team_index = {team_id: t for t, team_id in enumerate(self.team_ids)}
+        self.tick = 0
+        self.total_ticks = total_ticks
+        self.scores = [0] * len(self.team_ids)
+        self.errors: List[List[str]] = [[] for _ in self.team_ids]
+        self.orderings: Dict[int, List[str]] = {}
+
+        size = self.width * self.height
+        # Unit index standing on each cell, -1 if none
+        self.unit_at = [-1] * size
+        # Lying diamond index on each cell, -1 if none
+        self.diamond_at = [-1] * size
+
+        self.unit_ids: List[str] = []
+        self.unit_team: List[int] = []
+        self.unit_cell: List[int] = []
+        self.unit_diamond: List[int] = []
+        self.unit_summoning: List[int] = []
+        self.unit_index: Dict[str, int] = {}
+        for t, team_id in enumerate(self.team_ids):
+            for u in range(nb_units):
+                unit_id = f"{team_id}-{u}"
+                self.unit_index[unit_id] = len(self.unit_ids)
+                self.unit_ids.append(unit_id)
+                self.unit_team.append(t)
+                self.unit_cell.append(-1)
+                self.unit_diamond.append(-1)
+                self.unit_summoning.append(0)
+
+        empty_cells = [
+            i for i, tile in enumerate(self.static_map.tiles) if tile == EMPTY
+        ]
+        self.diamond_ids: List[str] = []
+        self.diamond_cell: List[int] = []
+        self.diamond_holder: List[int] = []
+        self.diamond_level: List[int] = []
+        for d, cell in enumerate(self.rng.sample(empty_cells, nb_diamonds)):
+            self.diamond_ids.append(f"diamond-{d}")
+            self.diamond_cell.append(cell)
+            self.diamond_holder.append(-1)
+            self.diamond_level.append(INITIAL_DIAMOND_SUMMON_LEVEL)
+            self.diamond_at[cell] = d
+
+        self._generate_orderings(0)
+
+    def is_over(self) -> bool:
+        return self.tick >= self.total_ticks
+
+    def _generate_orderings(self, start: int) -> None:
+        """Like the server, generate the next len(teams) ** 2 turn orders"""
+        for t in range(start, start + len(self.team_ids) ** 2):
+            order = self.team_ids[:]
+            self.rng.shuffle(order)
+            self.orderings[t] = order
+
+    def _position(self, cell: int) -> Position:
+        return Position(*divmod(cell, self.height))
+
+    def _cell(self, position: Optional[Position]) -> int:
+        if position is None or not (
+            0 <= position.x < self.width and 0 <= position.y < self.height
+        ):
+            return -1
+        return position.x * self.height + position.y
+
+    def get_ticks(self) -> List[Tick]:
+        """The current Tick, as seen by each team"""
+        teams = []
+        for t, team_id in enumerate(self.team_ids):
+            units = []
+            for u, unit_id in enumerate(self.unit_ids):
+                if self.unit_team[u] != t:
+                    continue
+                cell = self.unit_cell[u]
+                d = self.unit_diamond[u]
+                units.append(
+                    Unit(
+                        id=unit_id,
+                        teamId=team_id,
+                        path=[],
+                        hasDiamond=d != -1,
+                        hasSpawned=cell != -1,
+                        isSummoning=self.unit_summoning[u] > 0,
+                        lastState=TickTeamUnitState(),
+                        diamondId=self.diamond_ids[d] if d != -1 else None,
+                        position=self._position(cell) if cell != -1 else None,
+                    )
+                )
+            teams.append(
+                Team(
+                    id=team_id,
+                    name=team_id,
+                    score=self.scores[t],
+                    units=units,
+                    errors=self.errors[t],
+                )
+            )
+
+        diamonds = []
+        for d, diamond_id in enumerate(self.diamond_ids):
+            holder = self.diamond_holder[d]
+            cell = self.unit_cell[holder] if holder != -1 else self.diamond_cell[d]
+            diamonds.append(
+                Diamond(
+                    id=diamond_id,
+                    position=self._position(cell),
+                    summonLevel=self.diamond_level[d],
+                    points=self.diamond_level[d] * POINTS_PER_DIAMOND,
+                    ownerId=self.unit_ids[holder] if holder != -1 else None,
+                )
+            )
+
+        tick_map = TickMap(tiles=self.tiles, diamonds=diamonds)
+        tick_map._static_map = self.static_map
+        game_config = GameConfig(
+            pointsPerDiamond=POINTS_PER_DIAMOND,
+            maximumDiamondSummonLevel=MAXIMUM_DIAMOND_SUMMON_LEVEL,
+            initialDiamondSummonLevel=INITIAL_DIAMOND_SUMMON_LEVEL,
+        )
+        orderings = {
+            str(t): order for t, order in self.orderings.items() if t >= self.tick
+        }
+        return [
+            Tick(
+                tick=self.tick,
+                totalTick=self.total_ticks,
+                teamId=team_id,
+                teams=teams,
+                map=tick_map,
+                gameConfig=game_config,
+                teamPlayOrderings=orderings,
+            )
+            for team_id in self.team_ids
+        ]
+
+    def step(self, actions_by_team: Dict[str, List[CommandAction]]) -> None:
+        """Apply the actions of every team and move to the next tick"""
+        self.errors = [[] for _ in self.team_ids]
+        for team_id in self.orderings[self.tick]:
+            t = self.team_index[team_id]
+            played = set()
+            for action in actions_by_team.get(team_id) or []:
+                u = self.unit_index.get(action.unitId, -1)
+                if u == -1 or self.unit_team[u] != t:
+                    error = f"Unit '{action.unitId}' is not in your team"
+                elif u in played:
+                    error = "Unit already played this tick"
+                else:
+                    played.add(u)
+                    error = self._apply(u, action)
+                if error is not None:
+                    self.errors[t].append(f"({action.unitId}) {error}")
+
+        for u, remaining in enumerate(self.unit_summoning):
+            if remaining > 0:
+                self.unit_summoning[u] = remaining - 1
+                d = self.unit_diamond[u]
+                if remaining == 1 and d != -1:
+                    self.diamond_level[d] = min(
+                        self.diamond_level[d] + 1, MAXIMUM_DIAMOND_SUMMON_LEVEL
+                    )
+
+        for d, holder in enumerate(self.diamond_holder):
+            if holder != -1:
+                self.scores[self.unit_team[holder]] += (
+                    self.diamond_level[d] * POINTS_PER_DIAMOND
+                )
+
+        del self.orderings[self.tick]
+        self.tick += 1
+        # The bots always get the order of the next tick too
+        if self.tick + 1 not in self.orderings:
+            self._generate_orderings(self.tick + 1)
+
+    def _apply(self, u: int, action: CommandAction) -> Optional[str]:
+        """Apply one action, return an error message if it isn't valid"""
+        command = action.action
+        cell = self.unit_cell[u]
+        target = self._cell(action.target)
+
+        if command == CommandType.NONE:
+            return None
+        if command == CommandType.SPAWN:
+            if cell != -1:
+                return "Unit has already spawned"
+            if target == -1 or self.static_map.tiles[target] != SPAWN:
+                return "Target is not a spawn tile"
+            if self.unit_at[target] != -1:
+                return "Target spawn is occupied"
+            self._place(u, target)
+            return None
+
+        if cell == -1:
+            return "Unit has not spawned"
+        if self.unit_summoning[u] > 0:
+            return "Unit is summoning"
+
+        if command == CommandType.MOVE:
+            return self._move(u, cell, target)
+        if command == CommandType.SUMMON:
+            d = self.unit_diamond[u]
+            if d == -1:
+                return "Unit has no diamond"
+            if self.diamond_level[d] >= MAXIMUM_DIAMOND_SUMMON_LEVEL:
+                return f"Diamond with id '{self.diamond_ids[d]} is already at the maximum summon level!"
+            self.unit_summoning[u] = self.diamond_level[d]
+            return None
+        if command == CommandType.DROP:
+            d = self.unit_diamond[u]
+            if d == -1:
+                return "Unit has no diamond"
+            if (
+                not self._adjacent(cell, target)
+                or self.static_map.tiles[target] != EMPTY
+                or self.unit_at[target] != -1
+                or self.diamond_at[target] != -1
+            ):
+                return "Cannot drop the diamond there"
+            self._drop(u, target)
+            return None
+        if command == CommandType.ATTACK:
+            if not self._adjacent(cell, target):
+                return "Target is not adjacent"
+            victim = self.unit_at[target]
+            if victim == -1 or self.unit_team[victim] == self.unit_team[u]:
+                return "No enemy to attack there"
+            if self.unit_diamond[victim] != -1:
+                self._drop(victim, target)
+            self._remove(victim)
+            return None
+        if command == CommandType.VINE:
+            return self._vine(u, cell, target)
+        return f"Unknown action {command}"
+
+    def _adjacent(self, a: int, b: int) -> bool:
+        if b == -1:
+            return False
+        ax, ay = divmod(a, self.height)
+        bx, by = divmod(b, self.height)
+        return abs(ax - bx) + abs(ay - by) == 1
+
+    def _place(self, u: int, cell: int) -> None:
+        self.unit_cell[u] = cell
+        self.unit_at[cell] = u
+
+    def _remove(self, u: int) -> None:
+        self.unit_at[self.unit_cell[u]] = -1
+        self.unit_cell[u] = -1
+        self.unit_summoning[u] = 0
+
+    def _drop(self, u: int, cell: int) -> None:
+        d = self.unit_diamond[u]
+        self.unit_diamond[u] = -1
+        self.unit_summoning[u] = 0
+        self.diamond_holder[d] = -1
+        self.diamond_cell[d] = cell
+        self.diamond_at[cell] = d
+
+    def _move(self, u: int, cell: int, target: int) -> Optional[str]:
+        tiles = self.static_map.tiles
+        if (
+            not self._adjacent(cell, target)
+            or tiles[target] == WALL
+            or (tiles[cell] == EMPTY and tiles[target] == SPAWN)
+            or self.unit_at[target] != -1
+        ):
+            x, y = divmod(target, self.height) if target != -1 else (-1, -1)
+            return f"Target destination is not walkable: [x: {x}, y: {y}]"
+
+        d = self.diamond_at[target]
+        if d != -1:
+            if self.unit_diamond[u] != -1:
+                return "Unit already has a diamond"
+            self.diamond_at[target] = -1
+            self.diamond_cell[d] = -1
+            self.diamond_holder[d] = u
+            self.unit_diamond[u] = d
+
+        self.unit_at[cell] = -1
+        self._place(u, target)
+        return None
+
+    def _vine(self, u: int, cell: int, target: int) -> Optional[str]:
+        victim = self.unit_at[target] if target != -1 else -1
+        if victim == -1 or victim == u:
+            return "No unit to vine there"
+        if not self.static_map.is_line_clear(cell, target):
+            return "Vine is blocked"
+
+        step = 1 if cell // self.height == target // self.height else self.height
+        if target < cell:
+            step = -step
+        for between in range(cell + step, target, step):
+            if self.unit_at[between] != -1 or self.diamond_at[between] != -1:
+                return "Vine is blocked"
+
+        pulled_to = cell + step
+        if pulled_to != target:
+            self.unit_at[target] = -1
+            self._place(victim, pulled_to)
+        self.unit_summoning[victim] = 0
+
+        d = self.unit_diamond[victim]
+        if d != -1 and self.unit_diamond[u] == -1:
+            self.unit_diamond[victim] = -1
+            self.unit_diamond[u] = d
+            self.diamond_holder[d] = u
+        return None
+
+
+class GameResult:
+    def __init__(self, scores: Dict[str, int], tick_times: Dict[str, List[float]]):
+        self.scores = scores
+        # Seconds spent in get_next_moves for each tick, per team
+        self.tick_times = tick_times
+
+    def winner(self) -> str:
+        return max(self.scores, key=self.scores.get)
+
+
+def play_game(
+    bots: Dict[str, object],
+    tiles: Optional[List[List[str]]] = None,
+    size: int = 30,
+    nb_units: int = 4,
+    nb_diamonds: int = 8,
+    total_ticks: int = 100,
+    seed: Optional[int] = None,
+) -> GameResult:
+    """Play one game between bots, a dict of team id -> Bot-like object"""
+    rng = random.Random(seed)
+    if tiles is None:
+        tiles = generate_tiles(size, size, rng)
+    simulator = Simulator(
+        tiles,
+        list(bots),
+        nb_units=nb_units,
+        nb_diamonds=nb_diamonds,
+        total_ticks=total_ticks,
+        seed=rng.randrange(2**32),
+    )
+    tick_times: Dict[str, List[float]] = {team_id: [] for team_id in bots}
+
+    while not simulator.is_over():
+        actions = {}
+        for tick in simulator.get_ticks():
+            started = time.perf_counter()
+            actions[tick.teamId] = bots[tick.teamId].get_next_moves(tick)
+            tick_times[tick.teamId].append(time.perf_counter() - started)
+        simulator.step(actions)
+
+    for game_bot in bots.values():
+        end_game = getattr(game_bot, "end_game", None)
+        if end_game is not None:
+            end_game()
+
+    return GameResult(dict(zip(simulator.team_ids, simulator.scores)), tick_times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bot self-play without a server")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--size", type=int, default=30)
+    parser.add_argument("--teams", type=int, default=4)
+    parser.add_argument("--units", type=int, default=4)
+    parser.add_argument("--diamonds", type=int, default=8)
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from bot import Bot
+    from log import set_level
+
+    set_level("WARNING")
+    wins: Dict[str, int] = {}
+    tick_times: List[float] = []
+    started = time.perf_counter()
+    for game in range(args.games):
+        result = play_game(
+            {f"team-{t}": Bot() for t in range(args.teams)},
+            size=args.size,
+            nb_units=args.units,
+            nb_diamonds=args.diamonds,
+            total_ticks=args.ticks,
+            seed=args.seed + game,
+        )
+        wins[result.winner()] = wins.get(result.winner(), 0) + 1
+        for times in result.tick_times.values():
+            tick_times.extend(times)
+    elapsed = time.perf_counter() - started
+
+    tick_times.sort()
+    print(
+        f"{args.games} games in {elapsed:.2f} s "
+        f"({args.games / elapsed * 60:.0f} games/min)"
+    )
+    print(
+        f"get_next_moves: p50 {tick_times[len(tick_times) // 2] * 1000:.2f} ms, "
+        f"p99 {tick_times[int(len(tick_times) * 0.99)] * 1000:.2f} ms"
+    )
+    print(f"wins: {wins}")
+
+
+if __name__ == "__main__":
+    main()
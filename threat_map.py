@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING, Dict, List, Sequence
+
+from map_cache import EMPTY, SPAWN, UNREACHABLE, StaticMap
+from search_buffers import get_search_buffers
+
+if TYPE_CHECKING:
+    from game_message import Tick
+
+
+class ThreatMap:
+    """
+    How dangerous every cell is for one of our units, built once per tick
+    from the enemy units and shared by all our diamond carriers. Per cell
+    index i:
+    - enemy_dist[i] is the number of moves of the closest enemy to i, walls
+      only (enemies walk over diamonds), UNREACHABLE without enemies
+    - reach[i] is the same, minus one for the teams playing before us on the
+      next tick since they get to move first
+    - attack[i] is 1 if an enemy can attack a unit standing on i next tick
+    - vine[i] is 1 if an enemy is lined up to vine a unit standing on i,
+      the same test as Bot.are_we_in_lasso_danger_zone
+
+    Pure Python arrays, numpy isn't one of our dependencies. Rebuilt for
+    every tick it is asked for, not updated from the TickDiff: the enemies
+    and the turn order change every tick anyway, and the Bot only needs it
+    when the carrier search didn't finish.
+    """
+
+    def __init__(self, tick: Tick) -> None:
+        static_map = tick.map.get_static_map()
+        self.static_map = static_map
+        size = static_map.size
+        height = static_map.height
+        tiles = static_map.tiles
+
+        enemies_by_team: Dict[str, List[int]] = {}
+        for unit in tick.get_index().enemy_units:
+            enemies_by_team.setdefault(unit.teamId, []).append(
+                unit.position.x * height + unit.position.y
+            )
+
+        turn_order = tick.get_turn_order()
+        last_tick = tick.tick + 1 >= tick.totalTick
+
+        all_cells = []
+        first_cells = []
+        for team_id, cells in enemies_by_team.items():
+            all_cells.extend(cells)
+            if not last_tick and turn_order.plays_before(
+                tick.tick + 1, team_id, tick.teamId
+            ):
+                first_cells.extend(cells)
+        self.enemy_dist = self._bfs(static_map, all_cells)
+        # The teams playing after us start one move late, shift everything
+        # back so the others are one move ahead
+        self.reach = self._bfs(static_map, first_cells, all_cells)
+        reach = self.reach
+        for i, d in enumerate(reach):
+            if d != UNREACHABLE and d > 0:
+                reach[i] = d - 1
+
+        self.attack = bytearray(size)
+        for cells in enemies_by_team.values():
+            for cell in cells:
+                if tiles[cell] != EMPTY:
+                    continue
+                for v in static_map.neighbors(cell):
+                    if tiles[v] == EMPTY:
+                        self.attack[v] = 1
+
+        self.vine = bytearray(size)
+        for cells in enemies_by_team.values():
+            for cell in cells:
+                self._mark_vine_lines(cell)
+
+    @staticmethod
+    def _bfs(
+        static_map: StaticMap, sources: List[int], late_sources: Sequence[int] = ()
+    ) -> array:
+        """Multi-source BFS over the walls only, late_sources start at 1"""
+        walkable = static_map.walkable
+        dist = array("H", [UNREACHABLE]) * static_map.size
+        queue = get_search_buffers(static_map.size).queue
+        tail = 0
+        for source in sources:
+            if dist[source] == UNREACHABLE:
+                dist[source] = 0
+                queue[tail] = source
+                tail += 1
+        for source in late_sources:
+            if dist[source] == UNREACHABLE:
+                dist[source] = 1
+                queue[tail] = source
+                tail += 1
+        head = 0
+        adjacency = static_map.adjacency
+        while head < tail:
+            u = queue[head]
+            head += 1
+            new_dist = dist[u] + 1
+            for v in adjacency[u]:
+                if walkable[v] and dist[v] == UNREACHABLE:
+                    dist[v] = new_dist
+                    queue[tail] = v
+                    tail += 1
+        return dist
+
+    def _mark_vine_lines(self, cell: int) -> None:
+        """
+        Cells (x, y) where are_we_in_lasso_danger_zone sees the enemy at
+        (ex, ey) = cell: the columns next to the enemy when it isn't on a
+        spawn, clear down to row ey, otherwise the rows next to it, clear
+        up to column ex.
+        """
+        static_map = self.static_map
+        width, height = static_map.width, static_map.height
+        ex, ey = divmod(cell, height)
+        near_columns = static_map.tiles[cell] != SPAWN
+
+        if near_columns:
+            for x in range(max(ex - 1, 0), min(ex + 2, width)):
+                for i in self._segment_cells(
+                    static_map.column_segments, x * height + ey, 1
+                ):
+                    self.vine[i] = 1
+        for y in range(max(ey - 1, 0), min(ey + 2, height)):
+            for i in self._segment_cells(
+                static_map.row_segments, ex * height + y, height
+            ):
+                if not (near_columns and abs(i // height - ex) < 2):
+                    self.vine[i] = 1
+
+    @staticmethod
+    def _segment_cells(segments: array, start: int, step: int) -> List[int]:
+        """Cells of the row or column segment going through start"""
+        segment = segments[start]
+        if segment == 0:
+            return []
+        cells = [start]
+        i = start - step
+        while i >= 0 and segments[i] == segment:
+            cells.append(i)
+            i -= step
+        i = start + step
+        while i < len(segments) and segments[i] == segment:
+            cells.append(i)
+            i += step
+        return cells
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Optional, Set
+
+if TYPE_CHECKING:
+    from game_message import Tick
+
+
+class TickDiff:
+    """
+    What changed between two consecutive ticks of the same game, so the
+    structures derived from the previous tick (Grid, DistanceField) can be
+    updated instead of rebuilt.
+
+    changed_cells are the cell indices where a diamond appeared or
+    disappeared, that's all the Grid overlay depends on. When same_map is
+    False (first tick, or a new game) nothing can be reused.
+    """
+
+    def __init__(self, previous: Optional[Tick], current: Tick) -> None:
+        self.changed_cells: Set[int] = set()
+
+        static_map = current.map.get_static_map()
+        self.same_map = (
+            previous is not None
+            and previous.map.get_static_map() is static_map
+            and previous.tick < current.tick
+        )
+        if not self.same_map:
+            return
+
+        height = static_map.height
+        previous_cells = {
+            diamond.position.x * height + diamond.position.y
+            for diamond in previous.map.diamonds
+        }
+        current_cells = {
+            diamond.position.x * height + diamond.position.y
+            for diamond in current.map.diamonds
+        }
+        self.changed_cells = previous_cells ^ current_cells
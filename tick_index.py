@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from game_message import Diamond, Position, Tick, Unit
+
+
+class TickIndex:
+    """
+    Dictionaries over the units and diamonds of one Tick, built once per tick
+    so the bot never has to loop over every team and unit for a lookup.
+    """
+
+    def __init__(self, tick: Tick) -> None:
+        self.unit_at: Dict[Position, Unit] = {}
+        self.unit_by_id: Dict[str, Unit] = {}
+        self.units_by_team: Dict[str, List[Unit]] = {}
+        self.enemy_units: List[Unit] = []
+
+        for team in tick.teams:
+            self.units_by_team[team.id] = team.units
+            for unit in team.units:
+                self.unit_by_id[unit.id] = unit
+                if unit.position:
+                    self.unit_at[unit.position] = unit
+                    if team.id != tick.teamId:
+                        self.enemy_units.append(unit)
+
+        self.diamond_at: Dict[Position, Diamond] = {}
+        self.diamond_by_id: Dict[str, Diamond] = {}
+        self.holder_of: Dict[str, Unit] = {}
+
+        for diamond in tick.map.diamonds:
+            self.diamond_at[diamond.position] = diamond
+            self.diamond_by_id[diamond.id] = diamond
+            # Diamond.ownerId is the id of the unit carrying it
+            holder = self.unit_by_id.get(diamond.ownerId) if diamond.ownerId else None
+            if holder is not None:
+                self.holder_of[diamond.id] = holder
+
+        # In case the server didn't fill ownerId
+        for unit in self.unit_by_id.values():
+            if unit.hasDiamond and unit.diamondId:
+                self.holder_of.setdefault(unit.diamondId, unit)
+
+    def get_holder(self, diamond: Diamond) -> Optional[Unit]:
+        return self.holder_of.get(diamond.id)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Play many simulated games between bot variants in parallel, one game per
+worker process, and compare their win rate, score and latency.
+
+python tournament.py --bot old=bot_old:Bot --bot new=bot:Bot --games 200
+
+with bot_old.py a copy of a previous bot.py. A variant is name=module:Class,
+the class is built without arguments and must have a get_next_moves(tick)
+method. Every seed is played once per rotation of the seats (mirrored
+games), so every variant plays the same map and diamonds from every turn
+order position and seat; --games is the number of seeds.
+"""
+
+import argparse
+import importlib
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+from log import set_level
+from simulator import play_game
+
+
+def parse_variant(spec: str) -> Tuple[str, str]:
+    if "=" in spec:
+        name, path = spec.split("=", 1)
+    else:
+        name, path = spec, spec
+    if ":" not in path:
+        raise argparse.ArgumentTypeError(f"'{spec}' should be name=module:Class")
+    return name, path
+
+
+def load_bot(path: str) -> Any:
+    module_name, class_name = path.split(":")
+    module = importlib.import_module(module_name)
+    # A bot_old.py copied from before log.py prints when DEBUG is set
+    if hasattr(module, "DEBUG"):
+        module.DEBUG = False
+    return getattr(module, class_name)()
+
+
+def run_game(job: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Worker entry point: play one game, return one result per seat"""
+    # The bots log every decision, it would only slow the workers down
+    set_level("WARNING")
+    seats: List[Tuple[str, str]] = job["seats"]
+    bots = {f"team-{i}": load_bot(path) for i, (_, path) in enumerate(seats)}
+    result = play_game(
+        bots,
+        size=job["size"],
+        nb_units=job["units"],
+        nb_diamonds=job["diamonds"],
+        total_ticks=job["ticks"],
+        seed=job["seed"],
+    )
+    winner = result.winner()
+    return [
+        {
+            "variant": name,
+            "score": result.scores[team_id],
+            "won": team_id == winner,
+            "tick_times": result.tick_times[team_id],
+        }
+        for (name, _), team_id in zip(seats, bots)
+    ]
+
+
+def percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Parallel bot tournament")
+    parser.add_argument(
+        "--bot", dest="bots", action="append", type=parse_variant, default=[]
+    )
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--teams", type=int, default=4)
+    parser.add_argument("--size", type=int, default=30)
+    parser.add_argument("--units", type=int, default=4)
+    parser.add_argument("--diamonds", type=int, default=8)
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    variants = args.bots or [("bot", "bot:Bot")]
+    lineup = [variants[seat % len(variants)] for seat in range(args.teams)]
+    rotations = []
+    for rotation in range(args.teams):
+        seats = lineup[rotation:] + lineup[:rotation]
+        # With 2 variants and 4 teams only 2 of the 4 rotations differ
+        if seats not in rotations:
+            rotations.append(seats)
+    jobs = [
+        {
+            "seats": seats,
+            "size": args.size,
+            "units": args.units,
+            "diamonds": args.diamonds,
+            "ticks": args.ticks,
+            "seed": args.seed + game,
+        }
+        for game in range(args.games)
+        for seats in rotations
+    ]
+
+    stats: Dict[str, Dict[str, Any]] = {
+        name: {"seats": 0, "wins": 0, "score": 0, "tick_times": []}
+        for name, _ in variants
+    }
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes=args.workers) as pool:
+        for results in pool.imap_unordered(run_game, jobs):
+            for seat in results:
+                variant_stats = stats[seat["variant"]]
+                variant_stats["seats"] += 1
+                variant_stats["wins"] += seat["won"]
+                variant_stats["score"] += seat["score"]
+                variant_stats["tick_times"].extend(seat["tick_times"])
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{len(jobs)} games ({args.games} seeds x {len(rotations)} rotations) on "
+        f"{args.workers} workers in {elapsed:.1f} s "
+        f"({len(jobs) / elapsed * 60:.0f} games/min)"
+    )
+    for name, variant_stats in stats.items():
+        seats = variant_stats["seats"]
+        if seats == 0:
+            continue
+        times = sorted(variant_stats["tick_times"])
+        print(
+            f"{name}: win rate {variant_stats['wins'] / seats:.1%} "
+            f"over {seats} seats, mean score {variant_stats['score'] / seats:.0f}, "
+            f"tick p50 {percentile(times, 0.5) * 1000:.2f} ms "
+            f"p95 {percentile(times, 0.95) * 1000:.2f} ms "
+            f"p99 {percentile(times, 0.99) * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from array import array
+from typing import Dict, List
+
+
+class TurnOrder:
+    """
+    Tick.teamPlayOrderings ({"12": ["team-b", "team-a", ...], ...}) compiled
+    into a rank table, so the turn order questions of the bot are a lookup
+    instead of a list.index on a string-keyed dict.
+
+    ranks[(tick - first_tick) * nb_teams + team] is the position of the team
+    in the ordering of that tick, -1 if unknown. first_runs is laid out the
+    same way: the number of ticks in a row, from that tick on, where the team
+    plays first.
+    """
+
+    def __init__(self, orderings: Dict[str, List[str]]) -> None:
+        ticks = [int(tick) for tick in orderings]
+        self.first_tick = min(ticks, default=0)
+        # The server sends the orderings in order, the last one is the newest
+        self.last_generated = ticks[-1] if ticks else -1
+        nb_ticks = max(ticks, default=-1) - self.first_tick + 1
+
+        self.team_index: Dict[str, int] = {}
+        for ordering in orderings.values():
+            for team_id in ordering:
+                self.team_index.setdefault(team_id, len(self.team_index))
+        nb_teams = self.nb_teams = len(self.team_index)
+
+        self.ranks = array("b", [-1]) * (nb_ticks * nb_teams)
+        for tick, ordering in zip(ticks, orderings.values()):
+            row = (tick - self.first_tick) * nb_teams
+            for rank, team_id in enumerate(ordering):
+                self.ranks[row + self.team_index[team_id]] = rank
+
+        self.first_runs = array("H", [0]) * (nb_ticks * nb_teams)
+        for offset in range(nb_ticks - 1, -1, -1):
+            for team in range(nb_teams):
+                i = offset * nb_teams + team
+                if self.ranks[i] == 0:
+                    following = i + nb_teams
+                    self.first_runs[i] = 1 + (
+                        self.first_runs[following] if offset < nb_ticks - 1 else 0
+                    )
+
+    def _index(self, tick: int, team_id: str) -> int:
+        """Index in ranks and first_runs, -1 if the tick or team is unknown"""
+        team = self.team_index.get(team_id)
+        offset = tick - self.first_tick
+        if team is None or offset < 0 or offset * self.nb_teams >= len(self.ranks):
+            return -1
+        return offset * self.nb_teams + team
+
+    def rank(self, tick: int, team_id: str) -> int:
+        """Position of the team in the ordering of tick, -1 if unknown"""
+        i = self._index(tick, team_id)
+        return -1 if i == -1 else self.ranks[i]
+
+    def is_first(self, tick: int, team_id: str) -> bool:
+        return self.rank(tick, team_id) == 0
+
+    def plays_before(self, tick: int, team_id: str, other_team_id: str) -> bool:
+        rank = self.rank(tick, team_id)
+        other_rank = self.rank(tick, other_team_id)
+        return rank != -1 and other_rank != -1 and rank < other_rank
+
+    def first_in_a_row(self, tick: int, team_id: str) -> int:
+        """Number of ticks in a row, from tick on, where the team plays first"""
+        i = self._index(tick, team_id)
+        return 0 if i == -1 else self.first_runs[i]